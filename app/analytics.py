@@ -0,0 +1,182 @@
+# analytics.py (Journal Aggregates)
+import numpy as np
+from sqlalchemy import select, func, extract
+from . import db
+from .models import FarmJournal, JournalRollup
+from .rollups import truncate_date
+
+# Grouping key -> (output field, SQL expression over the rollups)
+GROUPINGS = {
+    'crop': ('crop_name', JournalRollup.crop_name),
+    'season': ('season', func.nullif(JournalRollup.season, '')),  # Rollups store a missing season as ''
+    'year': ('year', extract('year', JournalRollup.month)),
+}
+
+# Aggregates computed for every group from the monthly rollups, in one GROUP BY query
+AGGREGATES = [
+    ('entries', func.sum(JournalRollup.entries)),
+    ('total_revenue', func.sum(JournalRollup.total_revenue)),
+    ('total_expenses', func.sum(JournalRollup.total_expenses)),
+    ('total_profit', func.sum(JournalRollup.total_profit)),
+    ('avg_yield', func.sum(JournalRollup.total_yield) / func.sum(JournalRollup.entries)),
+    ('avg_unit_price', func.sum(JournalRollup.total_unit_price) / func.sum(JournalRollup.entries)),
+]
+
+
+def serialize_group(field, key, values):
+    group = {} if field is None else {field: int(key) if field == 'year' and key is not None else key}
+    for name, _ in AGGREGATES:
+        value = values[name]
+        group[name] = float(value) if value is not None and name != 'entries' else value
+    # ✅ Profit as a share of revenue; undefined when nothing was sold
+    group['margin'] = group['total_profit'] / group['total_revenue'] if group['total_revenue'] else None
+    return group
+
+
+def group_order(key):
+    """Sort key for group labels on every analytics path: missing season first, then by code point.
+
+    That's how Python and NumPy sort strings; an SQL ORDER BY would follow the database
+    collation instead, so e.g. "maize" and "Rice" could swap depending on the cache.
+    """
+    return (key is not None, key)
+
+
+def aggregate_statement(user_id, grouping):
+    """The rollup GROUP BY behind `aggregate_journal`; `flask check-indexes` EXPLAINs it too."""
+    key = GROUPINGS[grouping][1]
+    return select(key.label('key'), *[expression.label(name) for name, expression in AGGREGATES]) \
+        .where(JournalRollup.user_id == int(user_id)) \
+        .group_by(key)
+
+
+def aggregate_journal(user_id, grouping):
+    """Per-group totals and averages for one user, read from the rollups rather than the journal."""
+    field = GROUPINGS[grouping][0]
+    rows = sorted(db.session.execute(aggregate_statement(user_id, grouping)), key=lambda row: group_order(row.key))
+    return [serialize_group(field, row.key, row._mapping) for row in rows]
+
+
+class GroupTotals:
+    """Running sums over rollup rows, finished into the same fields as `aggregate_journal`."""
+    __slots__ = ('entries', 'revenue', 'expenses', 'profit', 'yield_sum', 'price_sum')
+
+    def __init__(self):
+        self.entries = 0
+        self.revenue = self.expenses = self.profit = self.yield_sum = self.price_sum = 0.0
+
+    def add(self, rollup):
+        self.entries += rollup.entries
+        self.revenue += rollup.total_revenue
+        self.expenses += rollup.total_expenses
+        self.profit += rollup.total_profit
+        self.yield_sum += rollup.total_yield
+        self.price_sum += rollup.total_unit_price
+
+    def values(self):
+        return {
+            'entries': self.entries,
+            'total_revenue': self.revenue,
+            'total_expenses': self.expenses,
+            'total_profit': self.profit,
+            'avg_yield': self.yield_sum / self.entries,
+            'avg_unit_price': self.price_sum / self.entries,
+        }
+
+
+def _sorted_groups(field, groups):
+    keys = sorted(groups, key=group_order)
+    return [serialize_group(field, key, groups[key].values()) for key in keys]
+
+
+TREND_BUCKETS = ('day', 'week', 'month', 'season', 'year')
+
+
+def lttb(x, y, threshold):
+    """Indices of `threshold` points picked by Largest-Triangle-Three-Buckets, keeping peaks and troughs.
+
+    The first and last points are always kept; every bucket in between contributes the point
+    that forms the largest triangle with the previous pick and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int).tolist()  # threshold - 2 buckets between the ends
+    picked = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        ax, ay = x[picked[-1]], y[picked[-1]]
+        area = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        picked.append(start + int(area.argmax()))
+    picked.append(n - 1)
+    return picked
+
+
+def _trend_rows(user_id, bucket):
+    """Rows in date order: `(date, profit)` per entry, or `(date, profit, entries[, season])` per bucket, summed in SQL."""
+    if bucket is None:
+        return db.session.query(FarmJournal.sowing_date, FarmJournal.profit) \
+            .filter(FarmJournal.user_id == int(user_id)) \
+            .order_by(FarmJournal.sowing_date, FarmJournal.id) \
+            .yield_per(5000)
+    if bucket in ('day', 'week'):
+        # Finer than the monthly rollups, so grouped from the journal (the sowing date index covers profit)
+        key = FarmJournal.sowing_date if bucket == 'day' else truncate_date('week', FarmJournal.sowing_date)
+        return db.session.query(key, func.sum(FarmJournal.profit), func.count(FarmJournal.id)) \
+            .filter(FarmJournal.user_id == int(user_id)) \
+            .group_by(key).order_by(key).all()
+    profit, entries = func.sum(JournalRollup.total_profit), func.sum(JournalRollup.entries)
+    if bucket == 'season':
+        # A season label repeats every year, so each (year, season) is one point, dated by its first month
+        year, season = extract('year', JournalRollup.month), func.nullif(JournalRollup.season, '')
+        key = func.min(JournalRollup.month)
+        rows = db.session.query(key, profit, entries, season) \
+            .filter(JournalRollup.user_id == int(user_id)) \
+            .group_by(year, season).all()
+        return sorted(rows, key=lambda row: (row[0], group_order(row[3])))
+    key = JournalRollup.month if bucket == 'month' else truncate_date('year', JournalRollup.month)
+    return db.session.query(key, profit, entries) \
+        .filter(JournalRollup.user_id == int(user_id)) \
+        .group_by(key).order_by(key).all()
+
+
+def profit_trend(user_id, bucket=None, max_points=None):
+    """Profit over sowing dates, per entry or per `bucket`, downsampled to at most `max_points` points."""
+    points, days = [], []
+    for row in _trend_rows(user_id, bucket):
+        point = {'sowing_date': row[0].strftime('%Y-%m-%d'), 'profit': row[1]}
+        if bucket is not None:
+            point['entries'] = row[2]
+        if bucket == 'season':
+            point['season'] = row[3]
+        points.append(point)
+        days.append(row[0].toordinal())
+    if max_points and len(points) > max_points:
+        points = [points[i] for i in lttb(days, [point['profit'] for point in points], max_points)]
+    return points
+
+
+def journal_summary(user_id, bucket=None, max_points=None):
+    """Every dashboard dataset: groups folded from the user's rollups, plus the profit trend."""
+    rollups = JournalRollup.query.filter(JournalRollup.user_id == int(user_id)).all()
+    overall = GroupTotals()
+    by_crop, by_season, by_year = {}, {}, {}
+    for rollup in rollups:
+        overall.add(rollup)
+        for groups, key in ((by_crop, rollup.crop_name), (by_season, rollup.season or None), (by_year, rollup.month.year)):
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = GroupTotals()
+            totals.add(rollup)
+
+    return {
+        'totals': serialize_group(None, None, overall.values()) if overall.entries else None,
+        'profit_trend': profit_trend(user_id, bucket, max_points),
+        'crop_comparison': _sorted_groups('crop_name', by_crop),
+        'season_comparison': _sorted_groups('season', by_season),
+        'yearly': _sorted_groups('year', by_year),
+    }
@@ -0,0 +1,237 @@
+# analytics_cache.py (Columnar Journal Snapshots)
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from . import db
+from .models import FarmJournal
+from .analytics import lttb, serialize_group
+from .exports import journal_filter_clauses
+
+ANALYTICS_FILTERS = ('crop', 'season', 'date_from', 'date_to')
+
+# Snapshot array -> journal column, for the numeric columns the analytics read
+VALUE_COLUMNS = {
+    'yield_amount': FarmJournal.yield_amount,
+    'unit_price': FarmJournal.unit_price,
+    'total_revenue': FarmJournal.total_revenue,
+    'expenses': FarmJournal.expenses,
+    'profit': FarmJournal.profit,
+}
+
+
+def parse_filters(args):
+    """`crop`, `season` and an inclusive `date_from`/`date_to` sowing date range. Raises ValueError on bad dates."""
+    filters = {key: args[key] for key in ANALYTICS_FILTERS if args.get(key)}
+    journal_filter_clauses(filters)  # Same validation and messages as the journal and export filters
+    for key in ('date_from', 'date_to'):
+        if key in filters:
+            filters[key] = date.fromisoformat(filters[key])
+    return filters
+
+
+class JournalSnapshot:
+    """One user's journal as NumPy columns in sowing date order, as of `version`.
+
+    Crop names and seasons are stored as codes into sorted label arrays (a missing
+    season is ''), so grouping is an integer `np.unique` plus `np.bincount` per sum.
+    Results have the same shape as the SQL-backed functions in analytics.py.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        columns = list(zip(*rows)) or [()] * (3 + len(VALUE_COLUMNS))
+        self.sowing_date = np.array(columns[0], dtype='datetime64[D]')
+        self.crops, crop_codes = np.unique(np.array(columns[1], dtype=object), return_inverse=True)
+        self.crop_code = crop_codes.astype(np.int32)
+        seasons = np.array([season or '' for season in columns[2]], dtype=object)
+        self.seasons, season_codes = np.unique(seasons, return_inverse=True)
+        self.season_code = season_codes.astype(np.int32)
+        self.values = {name: np.array(values, dtype=np.float64) for name, values in zip(VALUE_COLUMNS, columns[3:])}
+        arrays = [self.sowing_date, self.crop_code, self.season_code, self.crops, self.seasons, *self.values.values()]
+        labels = sum(sys.getsizeof(label) for label in (*self.crops, *self.seasons))
+        self.nbytes = sum(array.nbytes for array in arrays) + labels  # Approximate memory held by the snapshot
+
+    @classmethod
+    def load(cls, user_id, version):
+        statement = select(FarmJournal.sowing_date, FarmJournal.crop_name, FarmJournal.season, *VALUE_COLUMNS.values()) \
+            .where(FarmJournal.user_id == int(user_id)) \
+            .order_by(FarmJournal.sowing_date, FarmJournal.id)
+        return cls(version, db.session.execute(statement).all())
+
+    def __len__(self):
+        return len(self.sowing_date)
+
+    def select(self, filters):
+        """Indices of the rows matching `parse_filters` output, in date order."""
+        mask = np.ones(len(self), dtype=bool)
+        for key, labels, codes in (('crop', self.crops, self.crop_code), ('season', self.seasons, self.season_code)):
+            if key in filters:
+                found = np.flatnonzero(labels == filters[key])
+                mask &= codes == found[0] if len(found) else False
+        if 'date_from' in filters:
+            mask &= self.sowing_date >= np.datetime64(filters['date_from'])
+        if 'date_to' in filters:
+            mask &= self.sowing_date <= np.datetime64(filters['date_to'])
+        return np.flatnonzero(mask)
+
+    def _totals(self, rows, inverse, size):
+        """`aggregate_journal` values for each of `size` groups; `inverse` maps each row in `rows` to its group."""
+        entries = np.bincount(inverse, minlength=size)
+        sums = {name: np.bincount(inverse, weights=self.values[name][rows], minlength=size) for name in self.values}
+        return [{
+            'entries': int(entries[i]),
+            'total_revenue': sums['total_revenue'][i],
+            'total_expenses': sums['expenses'][i],
+            'total_profit': sums['profit'][i],
+            'avg_yield': sums['yield_amount'][i] / entries[i],
+            'avg_unit_price': sums['unit_price'][i] / entries[i],
+        } for i in range(size)]
+
+    def groups(self, grouping, filters=None):
+        """Same result as `aggregate_journal(user_id, grouping)`, optionally over filtered rows."""
+        rows = self.select(filters or {})
+        if grouping == 'crop':
+            field, keys, labels = 'crop_name', self.crop_code[rows], self.crops
+        elif grouping == 'season':
+            field, keys, labels = 'season', self.season_code[rows], [season or None for season in self.seasons]
+        else:
+            field, keys = 'year', self.sowing_date[rows].astype('datetime64[Y]').astype(np.int64) + 1970
+            labels = None
+        present, inverse = np.unique(keys, return_inverse=True)
+        totals = self._totals(rows, inverse, len(present))
+        return [serialize_group(field, labels[key] if labels is not None else int(key), values)
+                for key, values in zip(present, totals)]
+
+    def profit_trend(self, bucket=None, max_points=None, filters=None):
+        """Same result as `analytics.profit_trend`, optionally over filtered rows."""
+        rows = self.select(filters or {})
+        days = self.sowing_date[rows]
+        profit = self.values['profit'][rows]
+        entries = seasons = None
+        if bucket is not None:
+            if bucket == 'season':
+                # One point per (year, season), dated by its first sowing month; rows are in date order
+                years = days.astype('datetime64[Y]').astype(np.int64)
+                keys = years * len(self.seasons) + self.season_code[rows]
+                present, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+                starts = days[first].astype('datetime64[M]').astype('datetime64[D]')
+                season_codes = self.season_code[rows][first]
+                order = np.lexsort((season_codes, starts))
+                seasons = [self.seasons[code] or None for code in season_codes[order]]
+            else:
+                if bucket == 'week':
+                    starts = days - (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; weeks start on Monday
+                elif bucket == 'day':
+                    starts = days
+                else:
+                    starts = days.astype('datetime64[M]' if bucket == 'month' else 'datetime64[Y]').astype('datetime64[D]')
+                present, inverse = np.unique(starts, return_inverse=True)
+                starts, order = present, np.arange(len(present))
+            entries = np.bincount(inverse, minlength=len(present))[order]
+            profit = np.bincount(inverse, weights=profit, minlength=len(present))[order]
+            days = starts[order]
+
+        keep = range(len(days))
+        if max_points and len(days) > max_points:
+            keep = lttb(days.astype(np.int64), profit, max_points)
+        labels = np.datetime_as_string(days, unit='D')
+        points = []
+        for i in keep:
+            point = {'sowing_date': str(labels[i]), 'profit': float(profit[i])}
+            if entries is not None:
+                point['entries'] = int(entries[i])
+            if seasons is not None:
+                point['season'] = seasons[i]
+            points.append(point)
+        return points
+
+    def summary(self, bucket=None, max_points=None, filters=None):
+        """Same result as `journal_summary`, optionally over filtered rows."""
+        rows = self.select(filters or {})
+        overall = self._totals(rows, np.zeros(len(rows), dtype=np.int64), 1)[0] if len(rows) else None
+        return {
+            'totals': serialize_group(None, None, overall) if overall else None,
+            'profit_trend': self.profit_trend(bucket, max_points, filters),
+            'crop_comparison': self.groups('crop', filters),
+            'season_comparison': self.groups('season', filters),
+            'yearly': self.groups('year', filters),
+        }
+
+
+class AnalyticsCache:
+    """Per-process LRU of journal snapshots, bounded by their total size in bytes.
+
+    A snapshot is only served for the journal version it was loaded at, so any write
+    invalidates it. Snapshots larger than the whole budget are used once and dropped.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()  # user id -> JournalSnapshot, least recently used first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0  # Misses answered without a snapshot (`load=False`); counted in `misses` too
+        self.evictions = 0
+
+    def get(self, user_id, version, load=True):
+        """The user's snapshot at `version`; on a miss, loaded from the database if `load`, else None."""
+        user_id = int(user_id)
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is not None and snapshot.version == version:
+                self._snapshots.move_to_end(user_id)
+                self.hits += 1
+                return snapshot
+            if not load:
+                self.misses += 1
+                self.fallbacks += 1
+                return None
+
+        snapshot = JournalSnapshot.load(user_id, version)
+        with self._lock:
+            self.misses += 1
+            self._discard(user_id)
+            if snapshot.nbytes <= self.max_bytes:
+                self._snapshots[user_id] = snapshot
+                self._bytes += snapshot.nbytes
+                while self._bytes > self.max_bytes:
+                    self._discard(next(iter(self._snapshots)))
+                    self.evictions += 1
+        return snapshot
+
+    def _discard(self, user_id):
+        snapshot = self._snapshots.pop(user_id, None)
+        if snapshot is not None:
+            self._bytes -= snapshot.nbytes
+
+    def stats(self, user_id):
+        """Process-wide counters, plus details of `user_id`'s own snapshot only (None if not cached)."""
+        with self._lock:
+            total = self.hits + self.misses
+            snapshot = self._snapshots.get(int(user_id))
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'fallbacks': self.fallbacks,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'snapshots': len(self._snapshots),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'snapshot': {'version': snapshot.version, 'rows': len(snapshot), 'bytes': snapshot.nbytes}
+                            if snapshot is not None else None,
+            }
+
+
+def init_analytics_cache(app):
+    app.extensions['analytics_cache'] = AnalyticsCache(max_bytes=app.config.get('ANALYTICS_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def get_analytics_cache():
+    return current_app.extensions['analytics_cache']
@@ -0,0 +1,173 @@
+# commands.py (Flask CLI Maintenance Commands)
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+import click
+from flask import current_app
+from sqlalchemy import select, func, text, update
+from . import db
+from .models import User, FarmJournal, Post, Comment, PostLike
+from .reports import render_journal_pdf
+from .rollups import rebuild_rollups
+from .likes import get_like_buffer
+from .export_jobs import ExportWorker
+from .analytics import aggregate_statement
+
+SQLITE_PLAN_RE = re.compile(r"^(?:SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?")
+
+
+# The rollups' composite primary key index; SQLite names it itself
+ROLLUP_PKEY = {'postgresql': 'journal_rollups_pkey', 'sqlite': 'sqlite_autoindex_journal_rollups_1'}
+
+
+def hot_queries(user_id=1, post_id=1, dialect='postgresql'):
+    """`(label, statement, expected index)` for the queries behind the busiest routes."""
+    journal = select(FarmJournal.id, FarmJournal.crop_name).where(FarmJournal.user_id == user_id)
+    ranked = select(
+        Comment.id,
+        func.row_number().over(partition_by=Comment.post_id,
+                               order_by=(Comment.created_at.desc(), Comment.id.desc())).label('rank'),
+    ).where(Comment.post_id.in_([post_id, post_id + 1])).subquery()
+    return [
+        ('journal by created_at', journal.order_by(FarmJournal.created_at.desc(), FarmJournal.id.desc()).limit(51),
+         'ix_farm_journal_user_created'),
+        ('journal by sowing_date', journal.order_by(FarmJournal.sowing_date.desc(), FarmJournal.id.desc()).limit(51),
+         'ix_farm_journal_user_sowing'),
+        ('journal by crop_name', journal.order_by(FarmJournal.crop_name, FarmJournal.id).limit(51),
+         'ix_farm_journal_user_crop'),
+        ('journal changes', select(FarmJournal.id).where(FarmJournal.user_id == user_id, FarmJournal.version > 1)
+         .order_by(FarmJournal.version, FarmJournal.id).limit(501),
+         'ix_farm_journal_user_version'),
+        ('profit trend', select(FarmJournal.sowing_date, FarmJournal.profit)
+         .where(FarmJournal.user_id == user_id).order_by(FarmJournal.sowing_date),
+         'ix_farm_journal_user_sowing'),
+        ('crop comparison', aggregate_statement(user_id, 'crop'), ROLLUP_PKEY[dialect]),
+        ('feed page', select(Post.id).order_by(Post.created_at.desc(), Post.id.desc()).limit(21),
+         'ix_posts_created'),
+        ('comment page', select(Comment.id).where(Comment.post_id == post_id)
+         .order_by(Comment.created_at.desc(), Comment.id.desc()).limit(21),
+         'ix_comments_post_created'),
+        ('comment previews', select(ranked.c.id).where(ranked.c.rank <= 3),
+         'ix_comments_post_created'),
+    ]
+
+
+def _postgres_plan(node, scans):
+    if 'Relation Name' in node:
+        scans.append((node['Relation Name'], node.get('Index Name')))
+    for child in node.get('Plans', []):
+        _postgres_plan(child, scans)
+
+
+def explain_scans(conn, statement):
+    """`(table, index or None)` for every table access in the plan of `statement`."""
+    sql = str(statement.compile(conn, compile_kwargs={'literal_binds': True}))
+    scans = []
+    if conn.dialect.name == 'postgresql':
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        _postgres_plan(plan[0]['Plan'], scans)
+    else:
+        for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+            match = SQLITE_PLAN_RE.match(row[-1])
+            if match:
+                scans.append((match.group(1), match.group(2)))
+    return scans
+
+
+def init_commands(app):
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        """EXPLAIN the hot journal, analytics and feed queries and fail if any skips its index."""
+        failures = 0
+        with db.engine.connect() as conn:
+            if conn.dialect.name == 'postgresql':
+                # Small tables are cheapest to scan sequentially; we want to know the index is usable
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for label, statement, expected in hot_queries(dialect=conn.dialect.name):
+                scans = explain_scans(conn, statement)
+                used = {index for table, index in scans}
+                if expected in used:
+                    click.echo(f"ok    {label}: {expected}")
+                else:
+                    failures += 1
+                    found = ', '.join(f"{table} via {index or 'sequential scan'}" for table, index in scans)
+                    click.echo(f"FAIL  {label}: expected {expected}, plan uses {found}")
+            conn.rollback()
+        if failures:
+            raise click.ClickException(f"{failures} queries don't use their index")
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--user-id', type=int, help="Only rebuild this user's rollups.")
+    def rebuild_rollups_command(user_id):
+        """Recompute the analytics rollups from the journal, one user per transaction."""
+        user_ids = [user_id] if user_id else db.session.scalars(select(User.id).order_by(User.id)).all()
+        for uid in user_ids:
+            rebuild_rollups(uid)
+        click.echo(f"Rebuilt rollups for {len(user_ids):,} users")
+
+    @app.cli.command('reconcile-likes')
+    @click.confirmation_option(prompt="Web workers flush buffered likes on top of the recount, which counts them "
+                                      "twice. Have they been stopped?")
+    def reconcile_likes():
+        """Reset every post's like counter to its legacy likes plus its post_likes rows, e.g. after lost buffered deltas.
+
+        Run it with the web workers stopped: their buffered deltas are for post_likes rows
+        that are already written, so flushing them after the recount would count them twice.
+        """
+        counted = Post.legacy_likes + select(func.count()).select_from(PostLike) \
+            .where(PostLike.post_id == Post.id).scalar_subquery()
+        get_like_buffer().flush()
+        fixed = db.session.execute(update(Post).where(Post.likes != counted).values(likes=counted)
+                                   .execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        click.echo(f"Corrected like counts on {fixed:,} posts")
+
+    @app.cli.command('run-export-worker')
+    @click.option('--threads', default=2, show_default=True, help="Export jobs to run at once.")
+    @click.option('--interval', default=2.0, show_default=True, help="Seconds between scans for queued jobs.")
+    def run_export_worker(threads, interval):
+        """Run queued export jobs until interrupted, for web processes started with EXPORT_WORKERS=0."""
+        config = current_app.config
+        worker = ExportWorker(current_app._get_current_object(), max_workers=threads, folder=config['EXPORT_FOLDER'],
+                              ttl=config['EXPORT_TTL'], poll_interval=interval)
+        click.echo(f"Running export jobs with {threads} threads, checking for new ones every {interval:g}s")
+        try:
+            worker.poll()
+        except KeyboardInterrupt:
+            click.echo("Finishing running export jobs")
+            worker.shutdown()
+
+    @app.cli.command('benchmark-pdf')
+    @click.option('--rows', default=10000, show_default=True, help="Synthetic journal entries to render.")
+    def benchmark_pdf(rows):
+        """Time the PDF report for a journal of a given size, without touching the database."""
+        font_path = current_app.config.get('REPORT_FONT_PATH')
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "report.pdf")
+            started = time.perf_counter()
+            render_journal_pdf(synthetic_journal(rows), path, font_path)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(path)
+        font = font_path if font_path and os.path.exists(font_path) else "core Helvetica (no Unicode font found)"
+        click.echo(f"{rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s), {size / 1024:,.0f} KiB, font: {font}")
+
+
+def synthetic_journal(count, batch_size=1000):
+    """Batches of fake journal rows with mixed-script text, for benchmarks."""
+    crops = ["Rice", "धान", "Wheat", "ಗೋಧಿ", "Maize", "Café coffee"]
+    for start in range(0, count, batch_size):
+        yield [
+            SimpleNamespace(
+                crop_name=crops[i % len(crops)], season="Kharif", farm_location="North field, plot 7",
+                sowing_date=date(2024, 1, 1) + timedelta(days=i % 365), harvest_date=None,
+                yield_amount=1200.0, sold_amount=1000.0, unit_price=21.5, expenses=9000.0,
+                profit=12500.0, notes="Irrigated twice; good germination 🌱",
+            )
+            for i in range(start, min(start + batch_size, count))
+        ]
@@ -0,0 +1,94 @@
+# derivatives.py (Background Image Derivatives)
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from PIL import Image, ImageOps, features
+from .storage import content_path
+from .feed_cache import get_feed_cache
+
+# Longest edge in pixels for each derivative
+VARIANTS = {'thumb': 320, 'feed': 1080}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp'}
+VARIANT_FORMAT, VARIANT_EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def is_image(key):
+    return os.path.splitext(key)[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_key(key, name):
+    """`ab/cd/<sha>.jpg` -> `ab/cd/<sha>.thumb.webp`, stored next to the original."""
+    return f"{os.path.splitext(key)[0]}.{name}.{VARIANT_EXTENSION}"
+
+
+def available_variants(upload_folder, key):
+    """URLs of the derivatives of `key` that have been generated so far."""
+    if not key or not is_image(key):
+        return {}
+    return {
+        name: f"/uploads/{variant_key(key, name)}"
+        for name in VARIANTS
+        if os.path.exists(content_path(upload_folder, variant_key(key, name)))
+    }
+
+
+def generate_derivatives(upload_folder, key):
+    with Image.open(content_path(upload_folder, key)) as original:
+        image = ImageOps.exif_transpose(original)  # ✅ Phone photos are often stored rotated
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if VARIANT_FORMAT == 'JPEG' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+
+        for name, size in VARIANTS.items():
+            path = content_path(upload_folder, variant_key(key, name))
+            if os.path.exists(path):
+                continue  # Same content was uploaded before
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            variant.save(tmp_path, VARIANT_FORMAT, quality=80)
+            os.replace(tmp_path, path)
+
+
+def run_off_hub(function, *args):
+    """Call `function` on a real OS thread if gevent has patched threading (see gunicorn.conf.py), else directly.
+
+    Patched thread pools run their tasks as greenlets on the worker's only OS thread, so
+    CPU-bound work there would stop every other request until it finished. Pillow releases
+    the GIL while resizing and encoding, so the hub keeps serving requests meanwhile.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('threading'):
+        return sys.modules['gevent'].get_hub().threadpool.apply(function, args)
+    return function(*args)
+
+
+class DerivativeWorker:
+    """Generates derivatives off the request thread, then refreshes cached feed pages."""
+
+    def __init__(self, app, max_workers=2):
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="derivatives")
+
+    def submit(self, upload_folder, key, post_id):
+        if is_image(key):
+            return self._executor.submit(self._run, upload_folder, key, post_id)
+
+    def _run(self, upload_folder, key, post_id):
+        with self.app.app_context():
+            try:
+                run_off_hub(generate_derivatives, upload_folder, key)  # Only file and Pillow work; no gevent I/O
+            except Exception:
+                self.app.logger.exception("Failed to generate derivatives for %s", key)
+                return
+            get_feed_cache().invalidate_post(post_id)  # ✅ So the feed starts listing the variants
+
+
+def init_derivative_worker(app):
+    app.extensions['derivative_worker'] = DerivativeWorker(app, max_workers=app.config.get('DERIVATIVE_WORKERS', 2))
+
+
+def get_derivative_worker():
+    return current_app.extensions['derivative_worker']
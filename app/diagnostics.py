@@ -0,0 +1,25 @@
+# diagnostics.py (Debug Instrumentation)
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_query_counter(app):
+    """Count SQL statements per request and report them in an `X-Query-Count` header.
+
+    Enabled in debug mode or with `QUERY_COUNT_HEADER = True`, so N+1 regressions
+    show up as a count that grows with the page size.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.after_request
+    def add_query_count_header(response):
+        if app.debug or app.config.get('QUERY_COUNT_HEADER'):
+            response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+        return response
@@ -0,0 +1,157 @@
+# events.py (Feed Change Notifications)
+import json
+import re
+import threading
+import uuid
+from collections import deque
+from flask import current_app
+
+STREAM_ID_RE = re.compile(r'^(\d+)-(\d+)$')
+
+
+class LocalChangeFeed:
+    """Bounded in-process log of feed writes that clients can follow with a cursor.
+
+    Cursors are `<epoch>:<seq>`. The epoch changes whenever the process restarts, and
+    only the last `capacity` events are kept, so a cursor that is unknown or too old
+    yields `reset=True` and the client should reload its first page instead. Waiting
+    subscribers block on one shared condition rather than polling the database.
+    Each worker keeps its own log, so use `RedisChangeFeed` with more than one worker.
+    """
+
+    def __init__(self, capacity=1000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=capacity)  # (seq, event)
+        self._seq = 0
+
+    def publish(self, event_type, **data):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, {'type': event_type, **data}))
+            self._cond.notify_all()
+
+    def cursor(self):
+        with self._cond:
+            return f"{self.epoch}:{self._seq}"
+
+    def _parse(self, cursor):
+        epoch, _, seq = (cursor or "").partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _collect(self, seq):
+        # Caller holds the condition
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if seq is None or seq > self._seq or seq < oldest - 1:
+            return [], True
+        return [event for event_seq, event in self._events if event_seq > seq], False
+
+    def wait(self, cursor, timeout):
+        """Events after `cursor`, waiting up to `timeout` seconds for the first one.
+
+        Returns `(events, new_cursor, reset)`.
+        """
+        seq = self._parse(cursor)
+        with self._cond:
+            events, reset = self._collect(seq)
+            if not events and not reset and timeout > 0:
+                self._cond.wait_for(lambda: self._seq > seq, timeout=timeout)
+                events, reset = self._collect(seq)
+            return events, f"{self.epoch}:{self._seq}", reset
+
+
+def _stream_id(value):
+    """`<ms>-<seq>` stream id as a comparable tuple, or None if it isn't one."""
+    match = STREAM_ID_RE.match(value or "")
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class RedisChangeFeed:
+    """The same log kept in a Redis stream, so every worker publishes to and reads from one feed.
+
+    Cursors are stream ids. The stream is trimmed to about `capacity` events, and a cursor
+    from before the trimmed part (or from another store) yields `reset=True`. Waiting
+    subscribers block in XREAD on their own pooled connection, which is cheap under gevent.
+    """
+
+    STREAM_KEY = 'feed:changes'
+
+    def __init__(self, url, capacity=1000):
+        import redis  # Optional dependency, only needed for multi-worker deployments
+        self._redis = redis
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self.capacity = capacity
+
+    def publish(self, event_type, **data):
+        event = json.dumps({'type': event_type, **data})
+        self._client.xadd(self.STREAM_KEY, {'event': event}, maxlen=self.capacity, approximate=True)
+
+    def _info(self):
+        try:
+            return self._client.xinfo_stream(self.STREAM_KEY)
+        except self._redis.ResponseError:  # No stream until the first event
+            return {'last-generated-id': '0-0', 'length': 0}
+
+    def cursor(self):
+        return self._info()['last-generated-id']
+
+    def _lost(self, position, info):
+        """Whether events after `position` may have been trimmed away."""
+        if position is None or position > _stream_id(info['last-generated-id']):
+            return True  # Not a cursor from this stream
+        first = info.get('first-entry')
+        if not first or position >= _stream_id(first[0]):
+            return False
+        # Older than everything kept: lost if anything was ever trimmed (Redis < 7 has no counter; assume so when full)
+        added = info.get('entries-added')
+        return added > info['length'] if added is not None else info['length'] >= self.capacity
+
+    def wait(self, cursor, timeout):
+        """Events after `cursor`, waiting up to `timeout` seconds for the first one.
+
+        Returns `(events, new_cursor, reset)`.
+        """
+        info = self._info()
+        if self._lost(_stream_id(cursor), info):
+            return [], info['last-generated-id'], True
+
+        block = int(timeout * 1000) if timeout > 0 else None  # BLOCK 0 would wait forever
+        events = []
+        for _, entries in self._client.xread({self.STREAM_KEY: cursor}, block=block) or []:
+            for entry_id, fields in entries:
+                cursor = entry_id
+                events.append(json.loads(fields['event']))
+        return events, cursor, False
+
+
+def compact(events):
+    """Fold a run of events into one delta: new post ids, latest like counts, new comments."""
+    new_post_ids, likes, comments = [], {}, {}
+    for event in events:
+        if event['type'] == 'post':
+            new_post_ids.append(event['post_id'])
+        elif event['type'] == 'like':
+            likes[event['post_id']] = event['likes']
+        elif event['type'] == 'comment':
+            delta = comments.setdefault(event['post_id'], {'post_id': event['post_id'], 'new_comments': []})
+            delta['comment_count'] = event['comment_count']
+            delta['new_comments'].insert(0, event['comment'])  # ✅ Latest first, like the feed
+    return {
+        'new_post_ids': new_post_ids[::-1],
+        'likes': [{'post_id': post_id, 'likes': count} for post_id, count in likes.items()],
+        'comments': list(comments.values()),
+    }
+
+
+def init_change_feed(app):
+    capacity = app.config.get('CHANGE_FEED_CAPACITY', 1000)
+    if app.config.get('FEED_CACHE_URL'):
+        app.extensions['change_feed'] = RedisChangeFeed(app.config['FEED_CACHE_URL'], capacity=capacity)
+    else:
+        app.extensions['change_feed'] = LocalChangeFeed(capacity=capacity)
+
+
+def get_change_feed():
+    return current_app.extensions['change_feed']
@@ -0,0 +1,203 @@
+# export_jobs.py (Background Export Jobs)
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, func
+from . import db
+from .models import ExportJob, FarmJournal
+from .exports import iter_journal_csv, write_journal_parquet, journal_filter_clauses
+from .reports import build_cached_report
+from .journal_sync import current_journal_version
+
+EXPORT_FORMATS = {'pdf': 'application/pdf', 'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+def serialize_job(job, progress=None):
+    return {
+        'id': job.id,
+        'format': job.format,
+        'status': job.status,
+        'progress': round(job.progress if progress is None else progress, 3),
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'file_url': f"/exports/{job.id}/file" if job.status == 'done' else None,
+    }
+
+
+def _set_job(job_id, *where, **values):
+    # Own short transaction, so progress is visible while the export's cursor is still open
+    with db.engine.begin() as conn:
+        return conn.execute(update(ExportJob).where(ExportJob.id == job_id, *where).values(**values)).rowcount
+
+
+class ExportWorker:
+    """Runs export jobs on a thread pool; the `export_jobs` table is the source of truth.
+
+    A job is claimed with a conditional UPDATE, so it runs once even if submitted twice.
+    Besides the jobs it enqueues itself, a poller picks up queued jobs from the table
+    every `poll_interval` seconds, e.g. ones left behind by a restarted process. With
+    `max_workers=0` the web process only queues jobs, and `flask run-export-worker`
+    runs them in a process of its own (sharing `EXPORT_FOLDER`), so rendering never
+    competes with requests; that's how gunicorn.conf.py runs the gevent servers. Jobs
+    still queued or running after `ttl` are marked failed, and finished artifacts are
+    deleted after `ttl` as well. Progress of running jobs is kept in memory and also
+    saved to the table, except on SQLite, where the export's open read cursor would
+    block that write.
+    """
+
+    def __init__(self, app, max_workers=2, folder=None, ttl=3600, poll_interval=30):
+        self.app = app
+        self.folder = folder
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._progress = {}  # job id -> fraction done, for jobs running in this process
+        self._submitted = set()  # job ids handed to the executor and not finished yet
+        self._lock = threading.Lock()
+        self._poller = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exports") if max_workers else None
+
+    def enqueue(self, user_id, file_format, filters):
+        self.purge_expired()
+        job = ExportJob(id=uuid.uuid4().hex, user_id=int(user_id), format=file_format, params=json.dumps(filters))
+        db.session.add(job)
+        db.session.commit()
+        if self._executor is not None:
+            self._submit(job.id)
+        return job
+
+    def _submit(self, job_id):
+        with self._lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def start(self):
+        """Start the queued-job poller once per process; it first runs right away, then every `poll_interval`."""
+        with self._lock:
+            if self._poller is not None or not self.poll_interval or self._executor is None:
+                return
+            self._poller = threading.Thread(target=self.poll, name="exports-poller", daemon=True)
+        self._poller.start()
+
+    def poll(self):
+        """Submit queued jobs from the table every `poll_interval` seconds, forever."""
+        while True:
+            with self.app.app_context():
+                try:
+                    self.purge_expired()
+                    for (job_id,) in db.session.query(ExportJob.id).filter(ExportJob.status == 'queued') \
+                            .order_by(ExportJob.created_at):
+                        self._submit(job_id)
+                except Exception:
+                    self.app.logger.exception("Polling for queued export jobs failed")
+                finally:
+                    db.session.remove()
+            time.sleep(self.poll_interval)
+
+    def shutdown(self):
+        """Finish the running jobs; ones not started yet stay queued in the table for the next worker."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def progress(self, job_id):
+        return self._progress.get(job_id)
+
+    def fail_timed_out(self, job_id=None):
+        """Mark jobs still queued or running `ttl` after they were created as failed; just `job_id` if given."""
+        cutoff = datetime.now() - timedelta(seconds=self.ttl)
+        where = [ExportJob.status.in_(['queued', 'running']), ExportJob.created_at < cutoff]
+        if job_id is not None:
+            where.append(ExportJob.id == job_id)
+        return ExportJob.query.filter(*where) \
+            .update({'status': 'failed', 'error': 'Export timed out', 'finished_at': datetime.now()},
+                    synchronize_session=False)
+
+    def purge_expired(self):
+        now = datetime.now()
+        self.fail_timed_out()
+        for job in ExportJob.query.filter(ExportJob.expires_at < now, ExportJob.file_path.isnot(None)):
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            job.file_path = None
+        db.session.commit()
+
+    def _run(self, job_id):
+        try:
+            self._run_claimed(job_id)
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+
+    def _run_claimed(self, job_id):
+        with self.app.app_context():
+            if not _set_job(job_id, ExportJob.status == 'queued', status='running'):
+                return  # Already claimed (maybe by another process), or timed out while waiting
+            job = db.session.get(ExportJob, job_id)
+            path = os.path.join(self.folder, f"{job.id}.{job.format}")
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                self._export(job, path)
+            except Exception as e:
+                self.app.logger.exception("Export job %s failed", job_id)
+                if os.path.exists(path):
+                    os.remove(path)
+                _set_job(job_id, status='failed', error=str(e), finished_at=datetime.now())
+                return
+            finally:
+                self._progress.pop(job_id, None)
+                db.session.remove()
+
+            now = datetime.now()
+            if not _set_job(job_id, ExportJob.status == 'running', status='done', progress=1, file_path=path,
+                            finished_at=now, expires_at=now + timedelta(seconds=self.ttl)):
+                os.remove(path)  # Timed out while running; nobody will download it
+
+    def _export(self, job, path):
+        """PDF reports always cover the whole journal; CSV and Parquet honour the job's filters."""
+        clauses = journal_filter_clauses(json.loads(job.params or '{}')) if job.format != 'pdf' else []
+        total = db.session.query(func.count(FarmJournal.id)).filter(FarmJournal.user_id == job.user_id, *clauses).scalar()
+        done = 0
+        persist = db.engine.dialect.name != 'sqlite'
+
+        def progress(rows):
+            nonlocal done
+            done += rows
+            self._progress[job.id] = min(done / total, 0.99)
+            if persist:
+                _set_job(job.id, progress=self._progress[job.id])
+
+        if job.format == 'pdf':
+            # ✅ Reuses the per-version report cache, so a repeat export is just a copy
+            shutil.copyfile(build_cached_report(job.user_id, current_journal_version(job.user_id), progress), path)
+        elif job.format == 'csv':
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                for chunk in iter_journal_csv(job.user_id, clauses, progress):
+                    output.write(chunk)
+        else:
+            with open(path, 'wb') as output:
+                write_journal_parquet(job.user_id, output, clauses, progress)
+
+
+def init_export_worker(app):
+    app.extensions['export_worker'] = ExportWorker(
+        app,
+        max_workers=app.config.get('EXPORT_WORKERS', 2),
+        folder=app.config['EXPORT_FOLDER'],
+        ttl=app.config.get('EXPORT_TTL', 3600),
+        poll_interval=app.config.get('EXPORT_POLL_INTERVAL', 30),
+    )
+    # Only processes that serve requests run jobs, not e.g. `flask db upgrade`
+    app.before_request(app.extensions['export_worker'].start)
+
+
+def get_export_worker():
+    return current_app.extensions['export_worker']
@@ -0,0 +1,90 @@
+# exports.py (Machine-Readable Journal Exports)
+import csv
+import io
+from datetime import date
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from . import db
+from .models import FarmJournal
+
+BATCH_SIZE = 5000  # Rows fetched per round trip and written per Parquet record batch
+
+# Column names match the bulk import fields, so an export can be imported again
+EXPORT_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('crop_name', pa.string()),
+    ('season', pa.string()),
+    ('farm_location', pa.string()),
+    ('sowing_date', pa.date32()),
+    ('harvest_date', pa.date32()),
+    ('yield_amount', pa.float64()),
+    ('sold_amount', pa.float64()),
+    ('unit_price', pa.float64()),
+    ('total_revenue', pa.float64()),
+    ('expenses', pa.float64()),
+    ('profit', pa.float64()),
+    ('notes', pa.string()),
+    ('created_at', pa.timestamp('us')),
+    ('updated_at', pa.timestamp('us')),
+])
+
+
+def journal_filter_clauses(filters):
+    """Clauses for `crop`, `season` and a `date_from`/`date_to` sowing date range. Raises ValueError on bad values."""
+    for key in ('crop', 'season', 'date_from', 'date_to'):
+        if filters.get(key) is not None and not isinstance(filters[key], str):
+            raise ValueError(f"filter {key} must be a string")
+    clauses = []
+    if filters.get('crop'):
+        clauses.append(FarmJournal.crop_name == filters['crop'])
+    if filters.get('season'):
+        clauses.append(FarmJournal.season == filters['season'])
+    try:
+        if filters.get('date_from'):
+            clauses.append(FarmJournal.sowing_date >= date.fromisoformat(filters['date_from']))
+        if filters.get('date_to'):
+            clauses.append(FarmJournal.sowing_date <= date.fromisoformat(filters['date_to']))
+    except ValueError:
+        raise ValueError("Dates must be YYYY-MM-DD")
+    return clauses
+
+
+def journal_batches(user_id, clauses=(), progress=None):
+    """Lists of up to BATCH_SIZE export rows, read through a server-side cursor so memory stays flat.
+
+    `progress`, if given, is called with the number of rows in each batch once it has been consumed.
+    """
+    statement = select(*[getattr(FarmJournal, name) for name in EXPORT_SCHEMA.names]) \
+        .where(FarmJournal.user_id == int(user_id), *clauses) \
+        .order_by(FarmJournal.sowing_date, FarmJournal.id) \
+        .execution_options(yield_per=BATCH_SIZE)
+    for rows in db.session.execute(statement).partitions():
+        yield rows
+        if progress:
+            progress(len(rows))
+
+
+def iter_journal_csv(user_id, clauses=(), progress=None):
+    """Yield the CSV export a batch at a time, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_SCHEMA.names)
+    for rows in journal_batches(user_id, clauses, progress):
+        writer.writerows(rows)  # None is written as an empty field
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # Header of an empty export
+
+
+def write_journal_parquet(user_id, sink, clauses=(), progress=None):
+    """Write the export to `sink` as Parquet, one record batch per fetched batch of rows."""
+    with pq.ParquetWriter(sink, EXPORT_SCHEMA, compression='zstd') as writer:
+        for rows in journal_batches(user_id, clauses, progress):
+            columns = list(zip(*rows))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, EXPORT_SCHEMA)],
+                schema=EXPORT_SCHEMA,
+            ))
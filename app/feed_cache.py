@@ -0,0 +1,166 @@
+# feed_cache.py (Feed Page Cache)
+import json
+import threading
+from cachetools import TTLCache
+from flask import current_app
+
+
+class LocalCacheBackend:
+    """In-process LRU with a TTL. Each worker keeps its own copy."""
+
+    def __init__(self, maxsize=256, ttl=30):
+        self._lock = threading.Lock()
+        self._values = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._sets = TTLCache(maxsize=maxsize * 8, ttl=ttl)
+        self._counters = {}  # Never expire, so a counter can't go back to a value already used in keys
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+                self._sets.pop(key, None)
+
+    def add_to_set(self, key, member):
+        with self._lock:
+            members = self._sets.get(key, frozenset())
+            self._sets[key] = members | {member}
+
+    def members(self, key):
+        with self._lock:
+            return set(self._sets.get(key, ()))
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+
+class RedisCacheBackend:
+    """Shared backend so every worker sees the same pages and invalidations."""
+
+    def __init__(self, url, ttl=30):
+        import redis  # Optional dependency, only needed for multi-worker deployments
+        self._client = redis.Redis.from_url(url)
+        self._ttl = ttl
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(key, json.dumps(value), ex=self._ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+    def add_to_set(self, key, member):
+        pipe = self._client.pipeline()
+        pipe.sadd(key, member)
+        pipe.expire(key, self._ttl)
+        pipe.execute()
+
+    def members(self, key):
+        return {m.decode() for m in self._client.smembers(key)}
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        self._client.incr(key)  # No expiry, so a counter can't go back to a value already used in keys
+
+
+class FeedCache:
+    """Caches serialized `/posts` pages and keeps them in step with writes.
+
+    Keyset pages below the head never change when a post is created, so only head
+    pages are dropped on `create_post`. Head page keys carry a generation that
+    `invalidate_head` bumps; a request reads it before querying, so a head page built
+    from a read that raced a new post lands under the old generation, which nobody
+    reads any more. Pages are indexed by the posts they contain, which lets comments
+    invalidate and likes patch just the pages showing that post.
+    """
+
+    HEADS_KEY = 'feed:heads'
+    HEAD_GENERATION_KEY = 'feed:head-generation'
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def page_key(limit, before, generation=None):
+        return f"feed:page:{limit}:{before}" if before else f"feed:page:{limit}:head:{generation}"
+
+    @staticmethod
+    def post_key(post_id):
+        return f"feed:post:{post_id}"
+
+    def head_generation(self):
+        """Read before building a head page, and pass to `get_page`/`put_page`."""
+        return self.backend.counter(self.HEAD_GENERATION_KEY)
+
+    def get_page(self, limit, before, generation=None):
+        page = self.backend.get(self.page_key(limit, before, generation))
+        with self._lock:
+            if page is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return page
+
+    def put_page(self, limit, before, page, generation=None):
+        key = self.page_key(limit, before, generation)
+        self.backend.set(key, page)
+        for post in page['posts']:
+            self.backend.add_to_set(self.post_key(post['id']), key)
+        if not before:
+            self.backend.add_to_set(self.HEADS_KEY, key)
+
+    def invalidate_head(self):
+        self.backend.incr(self.HEAD_GENERATION_KEY)
+        self.backend.delete(*self.backend.members(self.HEADS_KEY), self.HEADS_KEY)
+
+    def invalidate_post(self, post_id):
+        post_key = self.post_key(post_id)
+        self.backend.delete(*self.backend.members(post_key), post_key)
+
+    def patch_post(self, post_id, **fields):
+        for key in self.backend.members(self.post_key(post_id)):
+            page = self.backend.get(key)
+            if page is None:
+                continue
+            posts = [{**post, **fields} if post['id'] == post_id else post for post in page['posts']]
+            self.backend.set(key, {**page, 'posts': posts})
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def init_feed_cache(app):
+    ttl = app.config.get('FEED_CACHE_TTL', 30)
+    if app.config.get('FEED_CACHE_URL'):
+        backend = RedisCacheBackend(app.config['FEED_CACHE_URL'], ttl=ttl)
+    else:
+        backend = LocalCacheBackend(maxsize=app.config.get('FEED_CACHE_SIZE', 256), ttl=ttl)
+    app.extensions['feed_cache'] = FeedCache(backend)
+
+
+def get_feed_cache():
+    return current_app.extensions['feed_cache']
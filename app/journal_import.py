@@ -0,0 +1,170 @@
+# journal_import.py (Bulk Journal Import)
+import csv
+import io
+import json
+import math
+from datetime import date
+import numpy as np
+from sqlalchemy import insert
+from . import db
+from .models import FarmJournal
+from .journal_sync import bump_journal_version
+from .rollups import apply_rollup_delta
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+CSV_TYPES = {'text/csv', 'application/csv'}
+NDJSON_TYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines'}
+INVALID_UTF8 = '\ufffd'  # What undecodable bytes are replaced with
+
+REQUIRED_FIELDS = ('crop_name', 'sowing_date', 'yield_amount', 'unit_price', 'expenses')
+NUMERIC_FIELDS = ('yield_amount', 'sold_amount', 'unit_price', 'expenses')
+TEXT_FIELDS = {'crop_name': 100, 'season': 50, 'farm_location': None, 'notes': None}
+DATE_FIELDS = ('sowing_date', 'harvest_date')
+EDITABLE_FIELDS = tuple(TEXT_FIELDS) + NUMERIC_FIELDS + DATE_FIELDS
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def iter_records(stream, mimetype):
+    """Yield `(line_number, record)` from a CSV or NDJSON body without reading it all into memory.
+
+    Unparseable lines, including ones that aren't valid UTF-8, are yielded with a
+    `ValueError` in place of the record, so earlier chunks never hide a later failure.
+    """
+    # ✅ Undecodable bytes become U+FFFD and fail only their own line, not the whole import.
+    # utf-8-sig drops the byte order mark Excel's "CSV UTF-8" puts before the first header
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    if mimetype in CSV_TYPES:
+        reader = csv.DictReader(text)
+        for record in reader:
+            if any(INVALID_UTF8 in str(value) for item in record.items() for value in item):
+                record = ValueError("Line is not valid UTF-8")
+            yield reader.line_num, record
+    elif mimetype in NDJSON_TYPES:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            if INVALID_UTF8 in line:
+                yield line_number, ValueError("Line is not valid UTF-8")
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = ValueError(f"Invalid JSON: {e}")
+            else:
+                if not isinstance(record, dict):
+                    record = ValueError("Each line must be a JSON object")
+            yield line_number, record
+    else:
+        raise UnsupportedFormat(mimetype)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and value.strip() in ("", "None"))
+
+
+def clean_field(name, value):
+    """Normalize one journal field value, raising ValueError if it is invalid."""
+    if name in TEXT_FIELDS:
+        value = None if _blank(value) else str(value).strip()
+        max_length = TEXT_FIELDS[name]
+        if value and max_length and len(value) > max_length:
+            raise ValueError(f"{name} cannot exceed {max_length} characters")
+        return value
+
+    if name in NUMERIC_FIELDS:
+        try:
+            value = 0.0 if _blank(value) else float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if not math.isfinite(value):  # float() accepts "nan" and "inf"
+            raise ValueError(f"{name} must be a finite number")
+        if value < 0:
+            raise ValueError(f"{name} cannot be negative")
+        return value
+
+    if name in DATE_FIELDS:
+        if _blank(value):
+            return None
+        try:
+            return date.fromisoformat(str(value).strip())
+        except ValueError:
+            raise ValueError("Dates must be YYYY-MM-DD")
+
+    raise ValueError(f"Unknown field: {name}")
+
+
+def validate_record(record):
+    """Return a row dict ready for insert (without derived columns), or raise ValueError."""
+    missing = [name for name in REQUIRED_FIELDS if _blank(record.get(name))]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    row = {name: clean_field(name, record.get(name)) for name in EDITABLE_FIELDS}
+    if row['harvest_date'] and row['harvest_date'] < row['sowing_date']:
+        raise ValueError("harvest_date cannot be earlier than sowing_date")
+    return row
+
+
+def validate_changes(changes):
+    """Validate a partial set of field updates, as used by batch edits."""
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("Nothing to update")
+    cleaned = {name: clean_field(name, value) for name, value in changes.items()}
+    for name in REQUIRED_FIELDS:
+        if name in cleaned and cleaned[name] is None:
+            raise ValueError(f"{name} cannot be empty")
+    if cleaned.get('harvest_date') and cleaned.get('sowing_date') and cleaned['harvest_date'] < cleaned['sowing_date']:
+        raise ValueError("harvest_date cannot be earlier than sowing_date")
+    return cleaned
+
+
+def insert_chunk(user_id, rows):
+    """Compute revenue/profit for a whole chunk at once and insert it as one multi-row INSERT."""
+    sold = np.fromiter((row['sold_amount'] for row in rows), dtype=float, count=len(rows))
+    unit_price = np.fromiter((row['unit_price'] for row in rows), dtype=float, count=len(rows))
+    expenses = np.fromiter((row['expenses'] for row in rows), dtype=float, count=len(rows))
+    total_revenue = sold * unit_price
+    profit = total_revenue - expenses
+    version = bump_journal_version(user_id)
+
+    for row, revenue, row_profit in zip(rows, total_revenue.tolist(), profit.tolist()):
+        row['user_id'] = user_id
+        row['total_revenue'] = revenue
+        row['profit'] = row_profit
+        row['version'] = version
+
+    db.session.execute(insert(FarmJournal.__table__), rows)
+    apply_rollup_delta(user_id, [FarmJournal.version == version], 1)
+    db.session.commit()
+
+
+def import_journal(user_id, stream, mimetype):
+    """Validate and insert a streamed CSV/NDJSON body in chunks; bad rows are reported, not fatal."""
+    inserted, failed, errors = 0, 0, []
+    chunk = []
+
+    for line_number, record in iter_records(stream, mimetype):
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            chunk.append(validate_record(record))
+        except ValueError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_number, 'error': str(e)})
+
+        if len(chunk) >= CHUNK_SIZE:
+            insert_chunk(user_id, chunk)
+            inserted += len(chunk)
+            chunk = []
+
+    if chunk:
+        insert_chunk(user_id, chunk)
+        inserted += len(chunk)
+
+    return {'inserted': inserted, 'failed': failed, 'errors': errors}
@@ -0,0 +1,62 @@
+# journal_sync.py (Journal Change Versions)
+from functools import wraps
+from flask import g, request, make_response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import update, insert, select, literal
+from . import db
+from .models import User, FarmJournal, JournalTombstone
+
+
+def bump_journal_version(user_id):
+    """Increment and return the user's journal version inside the current transaction.
+
+    The UPDATE holds the user's row lock until commit, so concurrent writers for the
+    same user commit in version order and a reader never sees version N before N-1.
+    """
+    return db.session.execute(
+        update(User).where(User.id == int(user_id))
+        .values(journal_version=User.journal_version + 1)
+        .returning(User.journal_version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def current_journal_version(user_id):
+    return db.session.query(User.journal_version).filter_by(id=int(user_id)).scalar() or 0
+
+
+def record_tombstones(user_id, version, where):
+    """Copy the ids of the entries matching `where` into tombstones, before they are deleted."""
+    db.session.execute(insert(JournalTombstone).from_select(
+        ['user_id', 'entry_id', 'version'],
+        select(FarmJournal.user_id, FarmJournal.id, literal(version)).where(*where)
+    ))
+
+
+def journal_etag(user_id, version):
+    return f"j{int(user_id)}-{version}"
+
+
+def journal_conditional(view):
+    """Answer `If-None-Match` from the user's journal version before the view loads any rows.
+
+    Responses get a weak ETag (the same data may serialize differently between releases)
+    and `Cache-Control: private, no-cache` so clients revalidate instead of guessing.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = get_jwt_identity()
+        # ✅ Read before the view: a write landing mid-request makes the ETag stale, never the body
+        g.journal_version = current_journal_version(user_id)  # Also keys the analytics cache
+        etag = journal_etag(user_id, g.journal_version)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
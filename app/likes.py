@@ -0,0 +1,103 @@
+# likes.py (Buffered Like Counters)
+import atexit
+import threading
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import bindparam, update
+from . import db
+from .models import Post
+
+
+class LikeCounterBuffer:
+    """Accumulates like/unlike deltas in memory and applies them to `posts.likes` in batches.
+
+    The per-user `post_likes` rows are written immediately (they carry the uniqueness
+    guarantee); only the denormalized counter is deferred, so a burst of likes on one
+    popular post becomes a single `likes = likes + n` update instead of one row lock
+    per like. Deltas are flushed every `flush_interval` seconds by a background thread,
+    which is woken early once `flush_threshold` of them are pending.
+    """
+
+    def __init__(self, app, flush_interval=2.0, flush_threshold=100):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)  # post_id -> unflushed delta
+        self._pending_count = 0
+        self._wakeup = threading.Event()
+        self._flusher = None
+
+    def add(self, post_id, delta):
+        with self._lock:
+            self._pending[post_id] += delta
+            self._pending_count += 1
+            if self._pending_count >= self.flush_threshold:
+                self._wakeup.set()
+        self._ensure_flusher()
+
+    def pending(self, post_id):
+        with self._lock:
+            return self._pending.get(post_id, 0)
+
+    def flush(self):
+        """Write all pending deltas in one transaction. Must run inside an app context."""
+        with self._lock:
+            batch = {post_id: delta for post_id, delta in self._pending.items() if delta}
+            count = self._pending_count
+            self._pending = defaultdict(int)
+            self._pending_count = 0
+        if not batch:
+            return
+
+        posts = Post.__table__
+        stmt = update(posts).where(posts.c.id == bindparam('b_id')) \
+            .values(likes=posts.c.likes + bindparam('b_delta'))
+        try:
+            # Sorted so concurrent workers lock rows in the same order
+            db.session.execute(stmt, [{'b_id': post_id, 'b_delta': delta} for post_id, delta in sorted(batch.items())])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:  # Keep the deltas (and their count, for the threshold) for the next attempt
+                for post_id, delta in batch.items():
+                    self._pending[post_id] += delta
+                self._pending_count += count
+            raise
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="like-flusher", daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self.app.logger.exception("Failed to flush buffered likes")
+
+    def _flush_at_exit(self):
+        with self.app.app_context():
+            self.flush()
+
+
+def init_like_buffer(app):
+    buffer = LikeCounterBuffer(
+        app,
+        flush_interval=app.config.get('LIKE_FLUSH_INTERVAL', 2.0),
+        flush_threshold=app.config.get('LIKE_FLUSH_THRESHOLD', 100),
+    )
+    app.extensions['like_buffer'] = buffer
+    atexit.register(buffer._flush_at_exit)
+    return buffer
+
+
+def get_like_buffer():
+    return current_app.extensions['like_buffer']
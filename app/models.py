@@ -7,11 +7,13 @@ class User(db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    journal_version = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)  # Bumped on every journal write
 
     # Relationships (Cascade delete when user is deleted)
     journals = db.relationship('FarmJournal', backref='user', lazy=True, cascade="all, delete-orphan")
     posts = db.relationship('Post', backref='author', lazy=True, cascade="all, delete-orphan")
     comments = db.relationship('Comment', backref='user', lazy=True, cascade="all, delete-orphan")
+    post_likes = db.relationship('PostLike', backref='user', lazy=True, cascade="all, delete-orphan")
 
 class FarmJournal(db.Model):
     __tablename__ = 'farm_journal'
@@ -30,11 +32,65 @@ class FarmJournal(db.Model):
     profit = db.Column(db.Float, nullable=False, default=0)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    version = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)  # User's journal_version at the last write
+
+    # One index per GET /journal sort order; the sowing date one also covers profit for the finer profit trends
+    # (the other analytics read journal_rollups)
+    __table_args__ = (
+        db.Index('ix_farm_journal_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_farm_journal_user_sowing', 'user_id', 'sowing_date', 'id',
+                 postgresql_include=['profit']),
+        db.Index('ix_farm_journal_user_crop', 'user_id', 'crop_name', 'id'),
+        db.Index('ix_farm_journal_user_version', 'user_id', 'version', 'id'),
+    )
 
     def calculate_revenue_and_profit(self):
         self.total_revenue = self.sold_amount * self.unit_price  
         self.profit = self.total_revenue - self.expenses
 
+class JournalTombstone(db.Model):
+    __tablename__ = 'journal_tombstones'
+    # Records deleted journal entries so /journal/changes can report them
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    entry_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (db.Index('ix_journal_tombstones_user_version', 'user_id', 'version'),)
+
+class JournalRollup(db.Model):
+    __tablename__ = 'journal_rollups'
+    # Per-user sums by crop, season and sowing month, kept in step with farm_journal by rollups.py
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    crop_name = db.Column(db.String(100), primary_key=True)
+    season = db.Column(db.String(50), primary_key=True, default='')  # '' stands for no season
+    month = db.Column(db.Date, primary_key=True)  # First day of the sowing month
+    entries = db.Column(db.Integer, nullable=False, default=0)
+    total_revenue = db.Column(db.Float, nullable=False, default=0)
+    total_expenses = db.Column(db.Float, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0)
+    total_yield = db.Column(db.Float, nullable=False, default=0)
+    total_sold = db.Column(db.Float, nullable=False, default=0)
+    total_unit_price = db.Column(db.Float, nullable=False, default=0)  # For the average unit price
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+    id = db.Column(db.String(32), primary_key=True)  # Random hex, so job URLs can't be guessed
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    format = db.Column(db.String(10), nullable=False)  # pdf, csv or parquet
+    params = db.Column(db.Text)  # JSON filters
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Float, nullable=False, default=0)
+    error = db.Column(db.Text)
+    file_path = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_export_jobs_status_created', 'status', 'created_at'),)
+
 class Post(db.Model):
     __tablename__ = 'posts'
     id = db.Column(db.Integer, primary_key=True)
@@ -43,8 +99,14 @@ class Post(db.Model):
     file_url = db.Column(db.String(255), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     likes = db.Column(db.Integer, default=0, nullable=False)
+    legacy_likes = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Anonymous likes from before post_likes
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Maintained by add_comment
     comments = db.relationship('Comment', backref='post', lazy=True, cascade="all, delete-orphan")
+    post_likes = db.relationship('PostLike', backref='post', lazy=True, cascade="all, delete-orphan")
     created_at = db.Column(db.DateTime, default=datetime.now)  # ✅ Ensure timestamp field exists
+    # Postgres also has a generated `search_vector` tsvector column (see search.py), left unmapped
+
+    __table_args__ = (db.Index('ix_posts_created', 'created_at', 'id'),)
 
 
 class Comment(db.Model):
@@ -54,3 +116,16 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete="CASCADE"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)  # ✅ Add timestamp field
+    # Postgres also has a generated `search_vector` tsvector column (see search.py), left unmapped
+
+    __table_args__ = (db.Index('ix_comments_post_created', 'post_id', 'created_at', 'id'),)
+
+
+class PostLike(db.Model):
+    __tablename__ = 'post_likes'
+    # Composite primary key: a user can like a given post at most once
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete="CASCADE"), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (db.Index('ix_post_likes_post', 'post_id'),)  # The primary key only serves lookups by user
@@ -0,0 +1,57 @@
+# pagination.py (Keyset Pagination Helpers)
+import base64
+from datetime import datetime
+from flask import request
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_limit(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read `?limit=` from the query string, clamped to [1, maximum]."""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(value, row_id):
+    """Encode a `(sort value, id)` position as an opaque URL-safe token."""
+    value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    raw = f"{value}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    """Decode a token from `encode_cursor` back to `(sort value, id)`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        value, row_id = raw.rsplit('|', 1)
+        return parse(value), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def keyset_after(query, sort_col, id_col, cursor, descending=True, parse=datetime.fromisoformat):
+    """Restrict `query` to rows strictly past `cursor` in (sort_col, id) order."""
+    if not cursor:
+        return query
+    value, row_id = decode_cursor(cursor, parse)
+    if descending:
+        return query.filter((sort_col < value) | ((sort_col == value) & (id_col < row_id)))
+    return query.filter((sort_col > value) | ((sort_col == value) & (id_col > row_id)))
+
+
+def keyset_before(query, created_col, id_col, cursor):
+    """Restrict `query` to rows strictly older than `cursor` in (created_at, id) order."""
+    return keyset_after(query, created_col, id_col, cursor)
+
+
+def page_of(rows, limit, key):
+    """Split a `limit + 1` fetch into the page and the cursor for the next one."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*key(rows[-1])) if has_more else None
+    return rows, next_cursor
@@ -0,0 +1,144 @@
+# reports.py (PDF Journal Report)
+import glob
+import os
+import tempfile
+from fpdf import FPDF, XPos, YPos
+from flask import current_app
+from .exports import journal_batches
+
+# (heading, width in mm, row attribute, alignment) on a landscape A4 page
+COLUMNS = [
+    ("Crop", 34, 'crop_name', 'L'),
+    ("Season", 22, 'season', 'L'),
+    ("Location", 30, 'farm_location', 'L'),
+    ("Sown", 22, 'sowing_date', 'L'),
+    ("Harvested", 22, 'harvest_date', 'L'),
+    ("Yield (kg)", 20, 'yield_amount', 'R'),
+    ("Sold (kg)", 20, 'sold_amount', 'R'),
+    ("Price (Rs.)", 18, 'unit_price', 'R'),
+    ("Expenses (Rs.)", 22, 'expenses', 'R'),
+    ("Profit (Rs.)", 22, 'profit', 'R'),
+    ("Notes", 45, 'notes', 'L'),
+]
+ROW_HEIGHT = 6
+MM_PER_CHAR = 1.7  # Rough average glyph width at 8pt, used to clip text without measuring every cell
+
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return " ".join(str(value).split())  # ✅ Newlines in notes would break the row
+
+
+def _clip(text, width):
+    limit = int(width / MM_PER_CHAR)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class JournalReport(FPDF):
+    """Table-layout report with the column headings repeated on every page.
+
+    Uses a Unicode TrueType font when `font_path` exists, embedding only the glyphs the
+    report uses; otherwise falls back to the core Helvetica font, which can only show
+    Latin-1, and replaces other characters with '?'.
+    """
+
+    def __init__(self, font_path=None):
+        super().__init__(orientation='L', unit='mm', format='A4')
+        self.set_auto_page_break(auto=True, margin=15)
+        self.unicode_font = bool(font_path and os.path.exists(font_path))
+        if self.unicode_font:
+            bold_path = font_path.replace('.ttf', '-Bold.ttf')
+            self.add_font('ReportFont', '', font_path)
+            self.add_font('ReportFont', 'B', bold_path if os.path.exists(bold_path) else font_path)
+            self.font_name = 'ReportFont'
+        else:
+            self.font_name = 'Helvetica'
+
+    def safe_text(self, value):
+        if self.unicode_font:
+            return value
+        return value.replace("…", "...").encode('latin-1', 'replace').decode('latin-1')
+
+    def header(self):
+        if self.page_no() == 1:
+            self.set_font(self.font_name, 'B', 16)
+            self.cell(0, 10, "Farm Journal Report", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+            self.ln(4)
+        self.set_font(self.font_name, 'B', 8)
+        self.set_fill_color(46, 125, 50)
+        self.set_text_color(255, 255, 255)
+        for heading, width, _, align in COLUMNS:
+            self.cell(width, ROW_HEIGHT + 1, heading, border=1, align=align, fill=True)
+        self.ln()
+        self.set_text_color(0, 0, 0)
+        self.set_font(self.font_name, '', 8)  # ✅ Body font is set once per page, not per row
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font(self.font_name, '', 7)
+        self.cell(0, 8, f"Page {self.page_no()}", align='R')
+
+    def add_row(self, row, fill):
+        self.set_fill_color(240, 255, 240)
+        for _, width, name, align in COLUMNS:
+            self.cell(width, ROW_HEIGHT, self.safe_text(_clip(_format(getattr(row, name)), width)), border=1, align=align, fill=fill)
+        self.ln()
+
+    def add_totals(self, count, expenses, profit):
+        self.ln(4)
+        self.set_font(self.font_name, 'B', 10)
+        self.cell(0, 8, self.safe_text(f"{count:,} entries   Total expenses: Rs.{expenses:,.2f}   Total profit: Rs.{profit:,.2f}"),
+                  new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+
+def render_journal_pdf(batches, path, font_path=None):
+    """Lay out journal rows, given as an iterable of row batches, into a PDF at `path`.
+
+    Rows are read a batch at a time, but fpdf keeps the laid-out pages in memory until
+    `output` writes the file (about 1 MiB per 1,000 rows).
+    """
+    pdf = JournalReport(font_path)
+    pdf.add_page()
+    count, expenses, profit = 0, 0.0, 0.0
+    for rows in batches:
+        for row in rows:
+            pdf.add_row(row, fill=count % 2 == 1)
+            count += 1
+            expenses += row.expenses or 0
+            profit += row.profit or 0
+    pdf.add_totals(count, expenses, profit)
+    pdf.output(path)
+
+
+def cached_report_path(user_id, version):
+    return os.path.join(current_app.config['REPORT_CACHE_FOLDER'], f"journal-{int(user_id)}-{version}.pdf")
+
+
+def build_cached_report(user_id, version, progress=None):
+    """Return the PDF for this user's journal version, rendering it only if it isn't cached yet."""
+    path = cached_report_path(user_id, version)
+    if os.path.exists(path):
+        return path
+
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    os.close(fd)
+    try:
+        render_journal_pdf(journal_batches(user_id, progress=progress), tmp_path, current_app.config.get('REPORT_FONT_PATH'))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Reports for older versions of this user's journal can never be served again
+    for old_path in glob.glob(os.path.join(folder, f"journal-{int(user_id)}-*.pdf")):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+    return path
@@ -0,0 +1,75 @@
+# rollups.py (Incremental Journal Rollups)
+from sqlalchemy import func, select, delete, cast, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
+from .models import User, FarmJournal, JournalRollup
+
+ROLLUP_KEY = ['user_id', 'crop_name', 'season', 'month']
+# Rollup column -> journal column it sums (entries counts rows)
+ROLLUP_SUMS = {
+    'total_revenue': FarmJournal.total_revenue,
+    'total_expenses': FarmJournal.expenses,
+    'total_profit': FarmJournal.profit,
+    'total_yield': FarmJournal.yield_amount,
+    'total_sold': FarmJournal.sold_amount,
+    'total_unit_price': FarmJournal.unit_price,
+}
+
+SQLITE_TRUNCATE = {
+    'day': ('start of day',),
+    'week': ('weekday 0', '-6 days'),  # Monday of the week
+    'month': ('start of month',),
+    'year': ('start of year',),
+}
+
+
+def truncate_date(unit, column):
+    """`column` rounded down to the start of its day, week, month or year, as a date."""
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.date_trunc(unit, column), Date)
+    return func.date(column, *SQLITE_TRUNCATE[unit], type_=Date)
+
+
+def rollup_source(where, sign=1):
+    """Per-group counts and sums of the journal rows matching `where`, multiplied by `sign`."""
+    season = func.coalesce(FarmJournal.season, '')
+    month = truncate_date('month', FarmJournal.sowing_date)
+    return select(
+        FarmJournal.user_id, FarmJournal.crop_name, season, month,
+        sign * func.count(FarmJournal.id),
+        *[sign * func.sum(column) for column in ROLLUP_SUMS.values()],
+    ).where(*where).group_by(FarmJournal.user_id, FarmJournal.crop_name, season, month)
+
+
+def _upsert():
+    return (postgresql if db.engine.dialect.name == 'postgresql' else sqlite).insert(JournalRollup)
+
+
+def apply_rollup_delta(user_id, where, sign):
+    """Add (`sign=1`) or remove (`sign=-1`) the user's journal rows matching `where` from the rollups.
+
+    Runs in the caller's transaction as one INSERT ... SELECT ... ON CONFLICT, so the
+    cost is proportional to the rows being written, not to the size of the journal.
+    Call it with -1 before rows change or are deleted and with +1 after they are written.
+    """
+    db.session.flush()
+    where = [FarmJournal.user_id == int(user_id), *where]
+    statement = _upsert().from_select(ROLLUP_KEY + ['entries'] + list(ROLLUP_SUMS), rollup_source(where, sign))
+    statement = statement.on_conflict_do_update(
+        index_elements=ROLLUP_KEY,
+        set_={name: getattr(JournalRollup, name) + getattr(statement.excluded, name)
+              for name in ['entries'] + list(ROLLUP_SUMS)},
+    )
+    db.session.execute(statement)
+    if sign < 0:
+        db.session.execute(delete(JournalRollup).where(JournalRollup.user_id == int(user_id), JournalRollup.entries <= 0))
+
+
+def rebuild_rollups(user_id):
+    """Recompute one user's rollups from the journal, e.g. to backfill or repair them."""
+    # ✅ Journal writers hold the user row (see bump_journal_version), so none can interleave
+    db.session.execute(select(User.id).where(User.id == user_id).with_for_update())
+    db.session.execute(delete(JournalRollup).where(JournalRollup.user_id == user_id))
+    db.session.execute(JournalRollup.__table__.insert().from_select(
+        ROLLUP_KEY + ['entries'] + list(ROLLUP_SUMS), rollup_source([FarmJournal.user_id == user_id])))
+    db.session.commit()
@@ -1,15 +1,33 @@
 # routes.py (API Routes)
 import os
-import mimetypes
-from flask import Blueprint, request, jsonify, send_from_directory, Response
-from werkzeug.utils import secure_filename
+import json
+import tempfile
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, g
 from . import db, bcrypt
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from .models import User, FarmJournal, Post, Comment
+from .models import User, FarmJournal, JournalTombstone, ExportJob, Post, Comment, PostLike
+from .likes import get_like_buffer
+from .feed_cache import get_feed_cache
+from .events import get_change_feed, compact
+from .search import search_posts, index_post, index_comment
+from .derivatives import available_variants, get_derivative_worker
+from .storage import save_upload, content_hash, UploadTooLarge
+from werkzeug.security import safe_join
+from .journal_import import import_journal, validate_changes, UnsupportedFormat
+from .exports import iter_journal_csv, write_journal_parquet, journal_filter_clauses
+from .reports import build_cached_report
+from .analytics import aggregate_journal, journal_summary, profit_trend, TREND_BUCKETS
+from .analytics_cache import parse_filters, get_analytics_cache
+from .export_jobs import EXPORT_FORMATS, serialize_job, get_export_worker
+from .rollups import apply_rollup_delta
+from .journal_sync import bump_journal_version, current_journal_version, record_tombstones, journal_conditional
+from .pagination import get_limit, keyset_after, keyset_before, page_of, InvalidCursor
 from flask import send_file
-from io import BytesIO
-from fpdf import FPDF
 from flask_cors import cross_origin
+from sqlalchemy import func, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 auth = Blueprint('auth', __name__)
 journal = Blueprint('journal', __name__)
@@ -83,34 +101,237 @@ def create_journal_entry():
 
     # Auto-calculate total revenue & profit
     entry.calculate_revenue_and_profit()
+    entry.version = bump_journal_version(user_id)
 
     db.session.add(entry)
+    db.session.flush()  # ✅ Assigns the id the rollup delta selects by
+    apply_rollup_delta(user_id, [FarmJournal.id == entry.id], 1)
     db.session.commit()
     
     return jsonify({"message": "Journal entry created successfully"}), 201
 
 
+JOURNAL_FIELDS = ['id', 'crop_name', 'season', 'farm_location', 'sowing_date', 'harvest_date', 'yield_amount',
+                  'sold_amount', 'unit_price', 'total_revenue', 'expenses', 'profit', 'notes']
+DATE_FIELDS = {'sowing_date', 'harvest_date'}
+
+# Sort key -> (column, parser for the cursor value)
+JOURNAL_SORTS = {
+    'created_at': (FarmJournal.created_at, datetime.fromisoformat),
+    'sowing_date': (FarmJournal.sowing_date, date.fromisoformat),
+    'crop_name': (FarmJournal.crop_name, str),
+}
+
+
+def serialize_journal_row(row, fields=JOURNAL_FIELDS):
+    return {name: str(getattr(row, name)) if name in DATE_FIELDS else getattr(row, name) for name in fields}
+
+
+def apply_journal_filters(query, filters):
+    return query.filter(*journal_filter_clauses(filters))
+
+
+@journal.route('/journal/bulk', methods=['POST'])
+@jwt_required()
+def bulk_import_journal():
+    """Import a streamed CSV (text/csv) or NDJSON (application/x-ndjson) body of journal entries."""
+    user_id = get_jwt_identity()
+    request.max_content_length = current_app.config['MAX_IMPORT_SIZE']  # ✅ Imports may exceed the upload limit
+
+    try:
+        result = import_journal(int(user_id), request.stream, request.mimetype)
+    except UnsupportedFormat:
+        return jsonify({'error': 'Body must be text/csv or application/x-ndjson'}), 415
+
+    return jsonify(result), 200
+
+
 @journal.route('/journal', methods=['GET'])
 @jwt_required()
+@journal_conditional
 def get_journal_entries():
     user_id = get_jwt_identity()
-    entries = FarmJournal.query.filter_by(user_id=int(user_id)).order_by(FarmJournal.created_at.desc()).all()  # ✅ Sort by latest first
-    
-    return jsonify([{
-        'id': entry.id,
-        'crop_name': entry.crop_name,
-        'season': entry.season,
-        'farm_location': entry.farm_location,
-        'sowing_date': str(entry.sowing_date),
-        'harvest_date': str(entry.harvest_date),
-        'yield_amount': entry.yield_amount,
-        'sold_amount': entry.sold_amount,
-        'unit_price': entry.unit_price,
-        'total_revenue': entry.total_revenue,
-        'expenses': entry.expenses,
-        'profit': entry.profit,
-        'notes': entry.notes
-    } for entry in entries]), 200
+    limit = get_limit(default=50, maximum=500)
+
+    fields = request.args.get('fields')
+    fields = ['id'] + [f for f in fields.split(',') if f and f != 'id'] if fields else JOURNAL_FIELDS
+    unknown = set(fields) - set(JOURNAL_FIELDS)
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+
+    sort = request.args.get('sort', 'created_at')
+    if sort not in JOURNAL_SORTS:
+        return jsonify({'error': f"Sort must be one of: {', '.join(JOURNAL_SORTS)}"}), 400
+    sort_col, parse = JOURNAL_SORTS[sort]
+    descending = request.args.get('order', 'desc') != 'asc'
+
+    # ✅ Only the requested columns are loaded, plus what the cursor needs
+    columns = list(dict.fromkeys(fields + [sort]))
+    query = db.session.query(*[getattr(FarmJournal, name) for name in columns]).filter(FarmJournal.user_id == int(user_id))
+    try:
+        query = apply_journal_filters(query, request.args)
+        query = keyset_after(query, sort_col, FarmJournal.id, request.args.get('cursor'), descending, parse)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    order = (sort_col.desc(), FarmJournal.id.desc()) if descending else (sort_col.asc(), FarmJournal.id.asc())
+    rows, next_cursor = page_of(query.order_by(*order).limit(limit + 1).all(), limit, lambda r: (getattr(r, sort), r.id))
+
+    return jsonify({
+        'entries': [serialize_journal_row(row, fields) for row in rows],
+        'next_cursor': next_cursor
+    }), 200
+
+@journal.route('/journal/changes', methods=['GET'])
+@jwt_required()
+def get_journal_changes():
+    """Entries written and ids deleted after version `since` (0 or missing for a full snapshot).
+
+    Large deltas are paged with `cursor`; keep the last page's `version` as the next `since`.
+    """
+    user_id = int(get_jwt_identity())
+    since = max(0, request.args.get('since', 0, type=int))
+    # ✅ Read the version first: anything committed later has a higher one and is left for the next sync
+    version = current_journal_version(user_id)
+    reset = since > version  # The client's copy isn't from this journal; start over
+    if reset:
+        since = 0
+
+    query = FarmJournal.query.filter(FarmJournal.user_id == user_id, FarmJournal.version <= version)
+    if since:
+        query = query.filter(FarmJournal.version > since)
+    try:
+        query = keyset_after(query, FarmJournal.version, FarmJournal.id, request.args.get('cursor'), descending=False, parse=int)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    limit = get_limit(default=500, maximum=5000)
+    rows, next_cursor = page_of(query.order_by(FarmJournal.version, FarmJournal.id).limit(limit + 1).all(),
+                                limit, lambda r: (r.version, r.id))
+
+    deleted = []
+    if since and not next_cursor:
+        deleted = [entry_id for (entry_id,) in db.session.query(JournalTombstone.entry_id).filter(
+            JournalTombstone.user_id == user_id, JournalTombstone.version > since, JournalTombstone.version <= version)]
+
+    return jsonify({
+        'version': version,
+        'entries': [{**serialize_journal_row(row), 'updated_at': row.updated_at.isoformat() if row.updated_at else None}
+                    for row in rows],
+        'deleted': deleted,
+        'next_cursor': next_cursor,
+        'reset': reset,
+    }), 200
+
+@journal.route('/journal/index', methods=['GET'])
+@jwt_required()
+@journal_conditional
+def get_journal_index():
+    """Just enough of every entry to pick one: (id, crop_name, sowing_date), latest sowing first."""
+    user_id = get_jwt_identity()
+    query = db.session.query(FarmJournal.id, FarmJournal.crop_name, FarmJournal.sowing_date) \
+        .filter(FarmJournal.user_id == int(user_id))
+    try:
+        query = apply_journal_filters(query, request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    rows = query.order_by(FarmJournal.sowing_date.desc(), FarmJournal.id.desc()).all()
+    return jsonify([serialize_journal_row(row, ['id', 'crop_name', 'sowing_date']) for row in rows]), 200
+
+
+@journal.route('/journal/<int:id>', methods=['GET'])
+@jwt_required()
+@journal_conditional
+def get_journal_entry(id):
+    user_id = get_jwt_identity()
+    entry = FarmJournal.query.filter_by(id=id, user_id=int(user_id)).first()
+
+    if not entry:
+        return jsonify({'error': 'Entry not found'}), 404
+
+    return jsonify(serialize_journal_row(entry)), 200
+
+MAX_BATCH_IDS = 10000
+
+
+def batch_selection(user_id, data):
+    """WHERE clauses for a batch request's `ids` list or `filter` object, always scoped to the user."""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    ids, filters = data.get('ids'), data.get('filter')
+    if ids:
+        if not isinstance(ids, list) or len(ids) > MAX_BATCH_IDS or not all(type(i) is int for i in ids):  # Not bools
+            raise ValueError(f"ids must be a list of at most {MAX_BATCH_IDS} integers")
+        clauses = [FarmJournal.id.in_(ids)]
+    elif isinstance(filters, dict) and any(filters.get(key) for key in ('crop', 'season', 'date_from', 'date_to')):
+        clauses = journal_filter_clauses(filters)
+    else:
+        raise ValueError("Provide a non-empty 'ids' list or 'filter' object")
+    return [FarmJournal.user_id == int(user_id)] + clauses
+
+
+@journal.route('/journal/batch', methods=['PATCH'])
+@jwt_required()
+def batch_update_journal_entries():
+    """Apply the same `set` changes to many entries in one UPDATE, recomputing revenue and profit in SQL."""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    try:
+        where = batch_selection(user_id, data)
+        values = validate_changes(data.get('set'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Setting only one of the dates must still keep each row's harvest on or after its sowing
+    if values.get('sowing_date') and 'harvest_date' not in values:
+        conflict = FarmJournal.harvest_date < values['sowing_date']
+    elif values.get('harvest_date') and 'sowing_date' not in values:
+        conflict = FarmJournal.sowing_date > values['harvest_date']
+    else:
+        conflict = None
+    if conflict is not None and db.session.query(FarmJournal.id).filter(*where, conflict).first():
+        return jsonify({'error': 'harvest_date cannot be earlier than sowing_date'}), 400
+
+    # ✅ Derived columns use the new value where one is given and the row's current value otherwise
+    if {'sold_amount', 'unit_price', 'expenses'} & set(values):
+        total_revenue = values.get('sold_amount', FarmJournal.sold_amount) * values.get('unit_price', FarmJournal.unit_price)
+        values['total_revenue'] = total_revenue
+        values['profit'] = total_revenue - values.get('expenses', FarmJournal.expenses)
+    version = values['version'] = bump_journal_version(user_id)
+
+    apply_rollup_delta(user_id, where, -1)
+    result = db.session.execute(update(FarmJournal).where(*where).values(**values).execution_options(synchronize_session=False))
+    # The filter may no longer match after the update, but the new version picks out exactly these rows
+    apply_rollup_delta(user_id, [FarmJournal.version == version], 1)
+    if result.rowcount:
+        db.session.commit()
+    else:
+        db.session.rollback()  # ✅ Don't advance the version when nothing matched
+    return jsonify({'message': 'Journal entries updated successfully', 'updated': result.rowcount}), 200
+
+
+@journal.route('/journal/batch', methods=['DELETE'])
+@jwt_required()
+def batch_delete_journal_entries():
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    try:
+        where = batch_selection(user_id, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    record_tombstones(user_id, bump_journal_version(user_id), where)
+    apply_rollup_delta(user_id, where, -1)
+    result = db.session.execute(delete(FarmJournal).where(*where).execution_options(synchronize_session=False))
+    if result.rowcount:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return jsonify({'message': 'Journal entries deleted successfully', 'deleted': result.rowcount}), 200
+
 
 @journal.route('/journal/<int:id>', methods=['PUT'])
 @jwt_required()
@@ -121,6 +342,9 @@ def update_journal_entry(id):
     if not entry:
         return jsonify({"error": "Entry not found"}), 404
 
+    # ✅ Version first: every writer takes the user row lock before touching rollups
+    entry.version = bump_journal_version(user_id)
+    apply_rollup_delta(user_id, [FarmJournal.id == entry.id], -1)  # Take out the old values before they change
     data = request.get_json()
     entry.crop_name = data["crop_name"]
     entry.season = data.get("season")
@@ -135,6 +359,7 @@ def update_journal_entry(id):
 
     # Auto-calculate revenue & profit on update
     entry.calculate_revenue_and_profit()
+    apply_rollup_delta(user_id, [FarmJournal.id == entry.id], 1)
 
     db.session.commit()
     
@@ -150,84 +375,208 @@ def delete_journal_entry(id):
     if not entry:
         return jsonify({'error': 'Entry not found'}), 404
     
+    record_tombstones(user_id, bump_journal_version(user_id), [FarmJournal.id == entry.id])
+    apply_rollup_delta(user_id, [FarmJournal.id == entry.id], -1)
     db.session.delete(entry)
     db.session.commit()
     return jsonify({'message': 'Journal entry deleted successfully'}), 200
 
 
+@journal.route('/export/csv', methods=['GET'])
+@jwt_required()
+def export_journal_to_csv():
+    """Stream the journal as CSV; accepts the same crop/season/date filters as GET /journal."""
+    user_id = get_jwt_identity()
+    try:
+        clauses = journal_filter_clauses(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    return Response(stream_with_context(iter_journal_csv(user_id, clauses)), mimetype='text/csv', headers={
+        'Content-Disposition': 'attachment; filename=farm_journal.csv',
+    })
+
+
+@journal.route('/export/parquet', methods=['GET'])
+@jwt_required()
+def export_journal_to_parquet():
+    user_id = get_jwt_identity()
+    try:
+        clauses = journal_filter_clauses(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    # ✅ Parquet writes its footer last, so spool to a temp file that spills to disk for big journals
+    output = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    write_journal_parquet(user_id, output, clauses)
+    output.seek(0)
+    return send_file(output, mimetype='application/vnd.apache.parquet', as_attachment=True, download_name="farm_journal.parquet")
+
+
 @journal.route('/export/pdf', methods=['GET'])
 @jwt_required()
+@journal_conditional
 def export_journal_to_pdf():
     user_id = get_jwt_identity()
-    entries = FarmJournal.query.filter_by(user_id=int(user_id)).all()
+    # ✅ Rendered once per journal version; repeat downloads are served from the cached file
+    path = build_cached_report(user_id, current_journal_version(user_id))
+    return send_file(path, mimetype='application/pdf', as_attachment=True, download_name="farm_journal.pdf", etag=False)
+
+
+@journal.route('/exports', methods=['POST'])
+@jwt_required()
+def create_export():
+    """Queue a pdf, csv or parquet export; poll GET /exports/<id> until it is done."""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    file_format = data.get('format')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    data_filter = data.get('filter') or {}
+    if not isinstance(data_filter, dict):
+        return jsonify({'error': "filter must be an object"}), 400
+    filters = {key: data_filter[key] for key in ('crop', 'season', 'date_from', 'date_to') if data_filter.get(key)}
+    try:
+        journal_filter_clauses(filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job = get_export_worker().enqueue(user_id, file_format, filters)
+    return jsonify(serialize_job(job)), 202
+
+
+def get_user_export(export_id):
+    return ExportJob.query.filter_by(id=export_id, user_id=int(get_jwt_identity())).first()
+
+
+@journal.route('/exports/<export_id>', methods=['GET'])
+@jwt_required()
+def get_export(export_id):
+    job = get_user_export(export_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+    worker = get_export_worker()
+    if job.status in ('queued', 'running') and worker.fail_timed_out(job.id):
+        db.session.commit()
+        db.session.refresh(job)
+    return jsonify(serialize_job(job, worker.progress(job.id))), 200
+
+
+@journal.route('/exports/<export_id>/file', methods=['GET'])
+@jwt_required()
+def download_export(export_id):
+    job = get_user_export(export_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+    if job.status != 'done':
+        return jsonify({'error': 'Export is not ready', 'status': job.status}), 409
+    if job.expires_at < datetime.now() or not job.file_path or not os.path.exists(job.file_path):
+        return jsonify({'error': 'Export has expired'}), 410
 
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(200, 10, "Farm Journal Report", ln=True, align='C')
-    pdf.ln(10)
+    return send_file(job.file_path, mimetype=EXPORT_FORMATS[job.format], as_attachment=True,
+                     download_name=f"farm_journal.{job.format}")
 
-    pdf.set_font("Arial", "B", 12)
-    for entry in entries:
-        pdf.cell(200, 10, f"Crop: {entry.crop_name} - {entry.season}", ln=True)
-        pdf.set_font("Arial", "", 10)
-        pdf.multi_cell(0, 8, f"Location: {entry.farm_location}\nSowing Date: {entry.sowing_date}\nHarvest Date: {entry.harvest_date}\nYield: {entry.yield_amount} kg\nUnit Price: Rs.{entry.unit_price} per kg\nExpenses: Rs.{entry.expenses}\nProfit: Rs.{entry.profit}\nNotes: {entry.notes}\n", border=1)
-        pdf.ln(5)
-        pdf.set_font("Arial", "B", 12)
 
-    pdf_output = BytesIO()
-    pdf_output.write(pdf.output(dest='S').encode('latin1'))
-    pdf_output.seek(0)
+def trend_options():
+    """`(bucket, max_points)` from the query string; max_points is clamped to [3, TREND_MAX_POINTS]."""
+    bucket = request.args.get('bucket') or None
+    if bucket is not None and bucket not in TREND_BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(TREND_BUCKETS)}")
+    limit = current_app.config['TREND_MAX_POINTS']
+    return bucket, max(3, min(request.args.get('max_points', limit, type=int), limit))
 
-    return send_file(pdf_output, mimetype='application/pdf', as_attachment=True, download_name="farm_journal.pdf")
 
+def analytics_snapshot(user_id, needs_rows):
+    """`(snapshot, filters)` for an analytics request; the snapshot is None when the rollups can answer instead.
 
+    A warm snapshot answers everything. On a miss it's only loaded for what the monthly
+    rollups can't answer: filtered queries and trends finer than a month (`needs_rows`).
+    """
+    filters = parse_filters(request.args)
+    snapshot = get_analytics_cache().get(user_id, g.journal_version, load=needs_rows or bool(filters))
+    return snapshot, filters
 
-@journal.route('/analytics/profit-trend', methods=['GET'])
-@jwt_required()
-def profit_trend():
+
+def grouped_analytics(grouping):
     user_id = get_jwt_identity()
-    entries = FarmJournal.query.filter_by(user_id=int(user_id)).order_by(FarmJournal.sowing_date).all()
+    try:
+        snapshot, filters = analytics_snapshot(user_id, needs_rows=False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400  # Bad date filter
+    if snapshot is None:
+        return jsonify(aggregate_journal(user_id, grouping)), 200
+    return jsonify(snapshot.groups(grouping, filters)), 200
 
-    data = [{
-        'sowing_date': entry.sowing_date.strftime('%Y-%m-%d'),
-        'profit': entry.profit
-    } for entry in entries]
 
-    return jsonify(data), 200
+@journal.route('/analytics/profit-trend', methods=['GET'])
+@jwt_required()
+@journal_conditional
+def get_profit_trend():
+    """Profit per entry, or summed per `bucket` (day, week, month, season, year), at most `max_points` points."""
+    user_id = get_jwt_identity()
+    try:
+        bucket, max_points = trend_options()
+        snapshot, filters = analytics_snapshot(user_id, needs_rows=bucket in (None, 'day', 'week'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if snapshot is None:
+        return jsonify(profit_trend(user_id, bucket, max_points)), 200
+    return jsonify(snapshot.profit_trend(bucket, max_points, filters)), 200
 
 
 @journal.route('/analytics/crop-comparison', methods=['GET'])
 @jwt_required()
+@journal_conditional
 def crop_comparison():
-    user_id = get_jwt_identity()
-    entries = FarmJournal.query.filter_by(user_id=int(user_id)).all()
-    
-    crop_profits = {}
-    for entry in entries:
-        if entry.crop_name not in crop_profits:
-            crop_profits[entry.crop_name] = 0
-        crop_profits[entry.crop_name] += entry.profit
-    
-    data = [{'crop_name': crop, 'total_profit': profit} for crop, profit in crop_profits.items()]
-    return jsonify(data), 200
+    return grouped_analytics('crop')
 
 
 @journal.route('/analytics/cost-breakdown', methods=['GET'])
 @jwt_required()
+@journal_conditional
 def cost_breakdown():
+    return grouped_analytics('crop')  # Same groups; clients read total_expenses
+
+
+@journal.route('/analytics/season-comparison', methods=['GET'])
+@jwt_required()
+@journal_conditional
+def season_comparison():
+    return grouped_analytics('season')
+
+
+@journal.route('/analytics/summary', methods=['GET'])
+@jwt_required()
+@journal_conditional
+def analytics_summary():
+    """Profit trend, per-crop (including costs), per-season and per-year data for the dashboard, in one response.
+
+    Takes the same `bucket` and `max_points` options as /analytics/profit-trend.
+    """
     user_id = get_jwt_identity()
-    entries = FarmJournal.query.filter_by(user_id=int(user_id)).all()
-    
-    crop_expenses = {}
-    for entry in entries:
-        if entry.crop_name not in crop_expenses:
-            crop_expenses[entry.crop_name] = 0
-        crop_expenses[entry.crop_name] += entry.expenses
-    
-    data = [{'crop_name': crop, 'total_expenses': expenses} for crop, expenses in crop_expenses.items()]
-    return jsonify(data), 200
+    try:
+        bucket, max_points = trend_options()
+        snapshot, filters = analytics_snapshot(user_id, needs_rows=bucket in (None, 'day', 'week'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if snapshot is None:
+        return jsonify(journal_summary(user_id, bucket, max_points)), 200
+    return jsonify(snapshot.summary(bucket, max_points, filters)), 200
+
+
+@journal.route('/analytics/yearly', methods=['GET'])
+@jwt_required()
+@journal_conditional
+def yearly_summary():
+    return grouped_analytics('year')
+
+
+@journal.route('/analytics/cache-stats', methods=['GET'])
+@jwt_required()
+def analytics_cache_stats():
+    return jsonify(get_analytics_cache().stats(get_jwt_identity())), 200
 
 
 
@@ -249,54 +598,247 @@ def create_post():
 
     filename = None
     if file:
-        filename = secure_filename(file.filename)
-        file.save(os.path.join(UPLOAD_FOLDER, filename))
+        # ✅ Streamed to disk and stored under its content hash, so identical files are kept once
+        try:
+            filename = save_upload(file, UPLOAD_FOLDER, current_app.config['MAX_UPLOAD_SIZE'])
+        except UploadTooLarge:
+            return jsonify({'error': 'File is too large'}), 413
 
     new_post = Post(title=title, description=description, file_url=filename, user_id=user_id)
     db.session.add(new_post)
     db.session.commit()
+    get_feed_cache().invalidate_head()  # ✅ Older keyset pages are unaffected by a new post
+    index_post(new_post)
+    get_change_feed().publish('post', post_id=new_post.id)
+    if filename:
+        get_derivative_worker().submit(UPLOAD_FOLDER, filename, new_post.id)
 
     return jsonify({'message': 'Post created successfully', 'post_id': new_post.id}), 201
 
 
-@posts.route('/posts', methods=['GET'])
-@jwt_required()
-def get_posts():
-    posts = Post.query.order_by(Post.created_at.desc()).all()  # ✅ Sort posts latest first
-    
-    result = [
+COMMENT_PREVIEW_SIZE = 3  # Latest comments embedded per post in the feed
+
+
+def serialize_comment(c):
+    return {'id': c.id, 'content': c.content, 'username': c.user.username, 'created_at': c.created_at.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def latest_comments_for(post_ids, per_post=COMMENT_PREVIEW_SIZE):
+    """Fetch the newest `per_post` comments of each post in one windowed query."""
+    if not post_ids:
+        return {}
+    ranked = db.session.query(
+        Comment.id,
+        func.row_number().over(
+            partition_by=Comment.post_id,
+            order_by=(Comment.created_at.desc(), Comment.id.desc())
+        ).label('rank')
+    ).filter(Comment.post_id.in_(post_ids)).subquery()
+
+    comments = Comment.query.options(joinedload(Comment.user)) \
+        .join(ranked, ranked.c.id == Comment.id) \
+        .filter(ranked.c.rank <= per_post) \
+        .order_by(Comment.created_at.desc(), Comment.id.desc()).all()  # ✅ Latest first
+
+    previews = {post_id: [] for post_id in post_ids}
+    for c in comments:
+        previews[c.post_id].append(serialize_comment(c))
+    return previews
+
+
+def serialize_posts(page):
+    """Serialize posts for the feed. The result is shared by all users, so it holds no per-user fields."""
+    previews = latest_comments_for([post.id for post in page])
+    like_buffer = get_like_buffer()
+
+    return [
         {
             'id': post.id,
             'title': post.title,
             'description': post.description,
             'file_url': f"/uploads/{post.file_url}" if post.file_url else None,
+            'variants': available_variants(UPLOAD_FOLDER, post.file_url),  # ✅ Smaller renditions for the feed
             'username': post.author.username,
-            'likes': post.likes or 0,
+            'likes': (post.likes or 0) + like_buffer.pending(post.id),  # ✅ Include likes not yet flushed
             'created_at': post.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            'comments': sorted(  # ✅ Sort comments latest first
-                [
-                    {'id': c.id, 'content': c.content, 'username': c.user.username, 'created_at': c.created_at.strftime("%Y-%m-%d %H:%M:%S")}
-                    for c in post.comments
-                ], 
-                key=lambda x: x['created_at'], 
-                reverse=True
-            )
+            'comment_count': post.comment_count,
+            'latest_comments': previews[post.id]
         }
-        for post in posts
+        for post in page
     ]
-    
-    return jsonify(result), 200
+
+
+def with_liked_by_me(serialized_posts):
+    """Overlay the current user's like state on shared, possibly cached, post dicts."""
+    post_ids = [post['id'] for post in serialized_posts]
+    liked = {post_id for (post_id,) in db.session.query(PostLike.post_id).filter(
+        PostLike.user_id == int(get_jwt_identity()), PostLike.post_id.in_(post_ids))} if post_ids else set()
+    return [{**post, 'liked_by_me': post['id'] in liked} for post in serialized_posts]
+
+
+def build_feed_page(limit, before):
+    query = Post.query.options(
+        joinedload(Post.author)  # ✅ Authors in the same query as the posts
+    ).order_by(Post.created_at.desc(), Post.id.desc())  # ✅ Sort posts latest first
+    query = keyset_before(query, Post.created_at, Post.id, before)
+
+    page, next_cursor = page_of(query.limit(limit + 1).all(), limit, lambda p: (p.created_at, p.id))
+    return {'posts': serialize_posts(page), 'next_cursor': next_cursor}
+
+
+@posts.route('/posts', methods=['GET'])
+@jwt_required()
+def get_posts():
+    limit = get_limit()
+    before = request.args.get('before')
+
+    feed_cache = get_feed_cache()
+    generation = feed_cache.head_generation() if not before else None  # Before reading posts; see FeedCache
+    page = feed_cache.get_page(limit, before, generation)
+    cache_status = 'HIT' if page is not None else 'MISS'
+    if page is None:
+        try:
+            page = build_feed_page(limit, before)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        feed_cache.put_page(limit, before, page, generation)
+
+    response = jsonify({'posts': with_liked_by_me(page['posts']), 'next_cursor': page['next_cursor']})
+    response.headers['X-Feed-Cache'] = cache_status
+    return response, 200
+
+
+@posts.route('/posts/search', methods=['GET'])
+@jwt_required()
+def search_feed():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    limit = get_limit()
+    offset = max(0, request.args.get('offset', 0, type=int))
+    ranked = search_posts(query, limit + 1, offset)  # Ranked results page by offset
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+
+    by_id = {post.id: post for post in Post.query.options(joinedload(Post.author)).filter(
+        Post.id.in_([post_id for post_id, _ in ranked]))} if ranked else {}
+    ranks = dict(ranked)
+    page = [by_id[post_id] for post_id, _ in ranked if post_id in by_id]
+    result = [{**post, 'rank': round(ranks[post['id']], 4)} for post in with_liked_by_me(serialize_posts(page))]
+
+    return jsonify({'posts': result, 'next_offset': offset + limit if has_more else None}), 200
+
+
+LONG_POLL_TIMEOUT = 25  # Seconds, kept under common proxy idle timeouts
+SSE_HEARTBEAT = 15
+
+
+@posts.route('/posts/changes', methods=['GET'])
+@jwt_required()
+def feed_changes():
+    """Long-poll for feed deltas after `since`. Without `since`, returns the current cursor to start from."""
+    change_feed = get_change_feed()
+    since = request.args.get('since')
+    if not since:
+        return jsonify({'cursor': change_feed.cursor(), 'reset': False, **compact([])}), 200
+
+    timeout = min(max(request.args.get('timeout', LONG_POLL_TIMEOUT, type=float), 0), LONG_POLL_TIMEOUT)
+    events, cursor, reset = change_feed.wait(since, timeout)
+    return jsonify({'cursor': cursor, 'reset': reset, **compact(events)}), 200
+
+
+@posts.route('/posts/stream', methods=['GET'])
+@jwt_required()
+def feed_stream():
+    """Server-sent events carrying the same deltas as /posts/changes, one message per batch of writes."""
+    change_feed = get_change_feed()
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('since') or change_feed.cursor()
+
+    def generate():
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        while True:
+            events, cursor, reset = change_feed.wait(cursor, SSE_HEARTBEAT)
+            if reset:
+                yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+            elif events:
+                yield f"id: {cursor}\ndata: {json.dumps(compact(events))}\n\n"
+            else:
+                yield ": keep-alive\n\n"  # Lets proxies and clients detect dead connections
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # ✅ Don't let nginx buffer the stream
+    })
+
+
+@posts.route('/posts/cache-stats', methods=['GET'])
+@jwt_required()
+def feed_cache_stats():
+    return jsonify(get_feed_cache().stats()), 200
+
+
+@posts.route('/posts/<int:post_id>/comments', methods=['GET'])
+@jwt_required()
+def get_comments(post_id):
+    if not db.session.query(Post.id).filter_by(id=post_id).first():
+        return jsonify({'error': 'Post not found'}), 404
+
+    limit = get_limit()
+    query = Comment.query.options(joinedload(Comment.user)) \
+        .filter_by(post_id=post_id) \
+        .order_by(Comment.created_at.desc(), Comment.id.desc())  # ✅ Latest first
+    try:
+        query = keyset_before(query, Comment.created_at, Comment.id, request.args.get('before'))
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    page, next_cursor = page_of(query.limit(limit + 1).all(), limit, lambda c: (c.created_at, c.id))
+    return jsonify({'comments': [serialize_comment(c) for c in page], 'next_cursor': next_cursor}), 200
+
+def current_likes(post_id):
+    """Stored like counter plus this worker's unflushed delta, or None if the post doesn't exist."""
+    likes = db.session.query(Post.likes).filter_by(id=post_id).scalar()
+    return None if likes is None else likes + get_like_buffer().pending(post_id)
+
 
 @posts.route('/posts/<int:post_id>/like', methods=['POST'])
 @jwt_required()
 def like_post(post_id):
-    post = Post.query.get(post_id)
-    if not post:
+    user_id = int(get_jwt_identity())
+    if not db.session.query(Post.id).filter_by(id=post_id).first():
         return jsonify({'error': 'Post not found'}), 404
 
-    post.likes += 1
+    # ✅ The (user_id, post_id) primary key rejects duplicate likes atomically
+    db.session.add(PostLike(user_id=user_id, post_id=post_id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Post already liked', 'likes': current_likes(post_id)}), 409
+
+    # The counter itself is updated in batches, so hot posts don't serialize on one row lock
+    get_like_buffer().add(post_id, 1)
+    likes = current_likes(post_id)
+    get_feed_cache().patch_post(post_id, likes=likes)
+    get_change_feed().publish('like', post_id=post_id, likes=likes)
+    return jsonify({'message': 'Post liked', 'likes': likes}), 200
+
+@posts.route('/posts/<int:post_id>/like', methods=['DELETE'])
+@jwt_required()
+def unlike_post(post_id):
+    user_id = int(get_jwt_identity())
+    removed = PostLike.query.filter_by(user_id=user_id, post_id=post_id).delete()
     db.session.commit()
-    return jsonify({'message': 'Post liked', 'likes': post.likes}), 200
+    if not removed:
+        return jsonify({'error': 'Post not liked'}), 404
+
+    get_like_buffer().add(post_id, -1)
+    likes = current_likes(post_id)
+    get_feed_cache().patch_post(post_id, likes=likes)
+    get_change_feed().publish('like', post_id=post_id, likes=likes)
+    return jsonify({'message': 'Post unliked', 'likes': likes}), 200
 
 @posts.route('/posts/<int:post_id>/comment', methods=['POST'])
 @jwt_required()
@@ -314,7 +856,12 @@ def add_comment(post_id):
 
     new_comment = Comment(content=content, user_id=user_id, post_id=post_id)
     db.session.add(new_comment)
+    # ✅ Keep the denormalized counter in the same transaction as the comment
+    Post.query.filter_by(id=post_id).update({Post.comment_count: Post.comment_count + 1}, synchronize_session=False)
     db.session.commit()
+    get_feed_cache().invalidate_post(post_id)  # ✅ Only pages showing this post need new previews
+    index_comment(new_comment)
+    get_change_feed().publish('comment', post_id=post_id, comment_count=post.comment_count, comment=serialize_comment(new_comment))
 
     return jsonify({'message': 'Comment added'}), 201
 
@@ -322,21 +869,26 @@ def add_comment(post_id):
 @posts.route('/uploads/<path:filename>', methods=['GET'])
 @cross_origin()
 def serve_file(filename):
-    """Serve uploaded files with correct MIME types to fix CORB issues."""
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
+    """Serve uploaded files with correct MIME types, Range support and HTTP caching."""
+    file_path = safe_join(os.path.abspath(UPLOAD_FOLDER), filename)  # ✅ Rejects path traversal
 
-    if not os.path.exists(file_path):
+    if file_path is None or filename.startswith('tmp/') or not os.path.isfile(file_path):
         return jsonify({"error": "File not found"}), 404
 
-    # Guess MIME type based on file extension
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if not mime_type:
-        mime_type = "application/octet-stream"  # Default MIME type
-
-    # Read the file and serve with correct headers
-    with open(file_path, "rb") as file:
-        response = Response(file.read(), content_type=mime_type)
-        response.headers["Access-Control-Allow-Origin"] = "*"  # ✅ Allow requests from anywhere
-        response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type"
-        return response
\ No newline at end of file
+    # Content-addressed files never change, so their hash is a strong ETag and they can be cached forever
+    sha = content_hash(filename)
+    response = send_file(
+        file_path,
+        conditional=True,  # ✅ Range (206), If-None-Match and If-Modified-Since (304)
+        etag=sha or True,
+        max_age=31536000 if sha else 3600,
+    )
+    if sha:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+
+    response.headers["Access-Control-Allow-Origin"] = "*"  # ✅ Allow requests from anywhere
+    response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Range, If-None-Match, If-Modified-Since"
+    response.headers["Access-Control-Expose-Headers"] = "Content-Range, Accept-Ranges, ETag"
+    return response
@@ -0,0 +1,131 @@
+# search.py (Full-Text Search)
+import math
+import re
+import threading
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import text
+from . import db
+from .models import Post, Comment
+
+# Relative weight of a match in each field
+TITLE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+COMMENT_WEIGHT = 0.2
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+             'of', 'on', 'or', 'that', 'the', 'to', 'was', 'with', 'my', 'i', 'how', 'what'}
+
+# Posts match through their own generated tsvector or any of their comments'
+POSTGRES_SEARCH_SQL = text("""
+    WITH q AS (SELECT websearch_to_tsquery('english', :q) AS query),
+    matches AS (
+        SELECT p.id AS post_id, ts_rank_cd(p.search_vector, q.query) AS rank
+        FROM posts p, q WHERE p.search_vector @@ q.query
+        UNION ALL
+        SELECT c.post_id, ts_rank_cd(c.search_vector, q.query) * :comment_weight
+        FROM comments c, q WHERE c.search_vector @@ q.query
+    )
+    SELECT post_id, SUM(rank) AS rank FROM matches
+    GROUP BY post_id
+    ORDER BY rank DESC, post_id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def tokenize(value):
+    return [t for t in TOKEN_RE.findall((value or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """In-process term -> post postings, used where Postgres full-text search isn't available.
+
+    Built lazily from the database on the first search and then updated incrementally,
+    so it only reflects writes made through this worker. Ranking is TF-IDF over the
+    weighted title, description and comment fields.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._postings = defaultdict(lambda: defaultdict(float))  # term -> post_id -> weighted tf
+        self._doc_ids = set()
+        self.built = False
+
+    def _add(self, post_id, value, weight):
+        for term in tokenize(value):
+            self._postings[term][post_id] += weight
+        self._doc_ids.add(post_id)
+
+    def add_post(self, post_id, title, description):
+        with self._lock:
+            self._add(post_id, title, TITLE_WEIGHT)
+            self._add(post_id, description, DESCRIPTION_WEIGHT)
+
+    def add_comment(self, post_id, content):
+        with self._lock:
+            self._add(post_id, content, COMMENT_WEIGHT)
+
+    def ensure_built(self):
+        with self._build_lock:
+            if not self.built:
+                self._build()
+
+    def _build(self):
+        for post_id, title, description in db.session.query(Post.id, Post.title, Post.description).yield_per(1000):
+            self.add_post(post_id, title, description)
+        for post_id, content in db.session.query(Comment.post_id, Comment.content).yield_per(1000):
+            self.add_comment(post_id, content)
+        self.built = True
+
+    def search(self, query):
+        """All posts containing every query term, as `(post_id, score)` best first."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            total = len(self._doc_ids)
+            candidates = set.intersection(*(set(p) for p in postings))
+            scores = {
+                post_id: sum(p[post_id] * math.log(1 + total / len(p)) for p in postings)
+                for post_id in candidates
+            }
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+def uses_postgres_search():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def search_posts(query, limit, offset):
+    """Ranked `(post_id, rank)` pairs for one page of search results."""
+    if uses_postgres_search():
+        rows = db.session.execute(POSTGRES_SEARCH_SQL, {
+            'q': query, 'comment_weight': COMMENT_WEIGHT, 'limit': limit, 'offset': offset
+        })
+        return [(row.post_id, float(row.rank)) for row in rows]
+
+    index = current_app.extensions['search_index']
+    index.ensure_built()
+    return index.search(query)[offset:offset + limit]
+
+
+# Postgres keeps its generated tsvector columns current by itself; only the fallback needs feeding
+def index_post(post):
+    index = current_app.extensions['search_index']
+    if index.built and not uses_postgres_search():
+        index.add_post(post.id, post.title, post.description)
+
+
+def index_comment(comment):
+    index = current_app.extensions['search_index']
+    if index.built and not uses_postgres_search():
+        index.add_comment(comment.post_id, comment.content)
+
+
+def init_search(app):
+    app.extensions['search_index'] = InvertedIndex()
@@ -0,0 +1,65 @@
+# storage.py (Content-Addressed Upload Storage)
+import hashlib
+import os
+import re
+import tempfile
+from werkzeug.utils import secure_filename
+
+CHUNK_SIZE = 64 * 1024
+CONTENT_KEY_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:\.[\w-]*)?$')  # Not `<sha>.thumb.webp` variants
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def content_hash(key):
+    """The SHA-256 of an original's content key, or None for derived variants and legacy flat filenames."""
+    match = CONTENT_KEY_RE.match(key)
+    return match.group(1) if match else None
+
+
+def content_path(upload_folder, key):
+    return os.path.join(upload_folder, *key.split('/'))
+
+
+def save_upload(file, upload_folder, max_size):
+    """Stream an uploaded file to disk and store it under its SHA-256.
+
+    The file is copied in chunks to a temp file while being hashed, and the copy is
+    aborted as soon as it exceeds `max_size`. The result is stored as
+    `ab/cd/<sha256><ext>`; if that key already exists the temp copy is discarded and
+    the existing file is reused. Returns the content key.
+    """
+    extension = os.path.splitext(secure_filename(file.filename or ""))[1].lower()
+    tmp_dir = os.path.join(upload_folder, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+
+        sha = digest.hexdigest()
+        key = f"{sha[:2]}/{sha[2:4]}/{sha}{extension}"
+        path = content_path(upload_folder, key)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # ✅ Identical content already stored
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)  # Atomic, so concurrent identical uploads are harmless
+        return key
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
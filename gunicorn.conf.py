@@ -0,0 +1,27 @@
+# gunicorn.conf.py (Production Server Settings)
+# Run with: gunicorn -c gunicorn.conf.py
+# and, next to it with the same EXPORT_FOLDER: flask --app "app:create_app()" run-export-worker
+import os
+
+wsgi_app = "app:create_app()"
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# ✅ gevent workers: each idle /posts/changes or /posts/stream subscriber is a greenlet, not a thread
+worker_class = "gevent"
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 1000))  # Open connections (incl. subscribers) per worker
+
+# Workers only share the feed log and page cache through Redis, so run one worker without it
+workers = int(os.getenv("WEB_CONCURRENCY", 4 if os.getenv("FEED_CACHE_URL") else 1))
+
+# Under gevent the app's thread pools are greenlets on one OS thread, so nothing CPU-bound may run on them:
+# exports run in `flask run-export-worker`, thumbnails on gevent's native threadpool (see derivatives.py)
+# and the like flusher only waits on the database
+os.environ.setdefault("EXPORT_WORKERS", "0")
+
+timeout = 120  # Seconds a worker may go without a heartbeat before it is restarted
+
+
+def post_fork(server, worker):
+    # psycopg2 is a C extension gevent can't patch; make its waits yield to other greenlets
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -0,0 +1,39 @@
+"""Dropped covered columns from journal crop index
+
+Revision ID: 5e8d2c41b7a9
+Revises: 9c4f1a7be352
+Create Date: 2026-10-18 21:12:36.540917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8d2c41b7a9'
+down_revision = '9c4f1a7be352'
+branch_labels = None
+depends_on = None
+
+# The crop analytics read journal_rollups now, so only GET /journal?sort=crop_name uses this
+# index, and it never needed the covered columns. Only Postgres has INCLUDE to drop.
+NAME, TABLE, COLUMNS = 'ix_farm_journal_user_crop', 'farm_journal', ['user_id', 'crop_name', 'id']
+COVERED = ['yield_amount', 'total_revenue', 'expenses', 'profit']
+
+
+def rebuild(include):
+    # Build the replacement first, so crop-sorted journal pages keep an index throughout
+    with op.get_context().autocommit_block():
+        op.create_index(f"{NAME}_new", TABLE, COLUMNS, postgresql_concurrently=True, postgresql_include=include)
+        op.drop_index(NAME, table_name=TABLE, postgresql_concurrently=True)
+        op.execute(f"ALTER INDEX {NAME}_new RENAME TO {NAME}")
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        rebuild([])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        rebuild(COVERED)
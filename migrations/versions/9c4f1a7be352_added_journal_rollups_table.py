@@ -0,0 +1,55 @@
+"""Added journal rollups table
+
+Revision ID: 9c4f1a7be352
+Revises: 0b7e4d92a6f1
+Create Date: 2026-10-18 18:05:47.203318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4f1a7be352'
+down_revision = '0b7e4d92a6f1'
+branch_labels = None
+depends_on = None
+
+# First day of the sowing month, per dialect
+MONTH = {
+    'postgresql': "CAST(date_trunc('month', sowing_date) AS DATE)",
+    'sqlite': "date(sowing_date, 'start of month')",
+}
+
+
+def upgrade():
+    op.create_table('journal_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('crop_name', sa.String(length=100), nullable=False),
+    sa.Column('season', sa.String(length=50), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('entries', sa.Integer(), nullable=False),
+    sa.Column('total_revenue', sa.Float(), nullable=False),
+    sa.Column('total_expenses', sa.Float(), nullable=False),
+    sa.Column('total_profit', sa.Float(), nullable=False),
+    sa.Column('total_yield', sa.Float(), nullable=False),
+    sa.Column('total_sold', sa.Float(), nullable=False),
+    sa.Column('total_unit_price', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'crop_name', 'season', 'month')
+    )
+
+    # Backfill from the existing journal; `flask rebuild-rollups` repairs a user later if needed
+    month = MONTH[op.get_bind().dialect.name]
+    op.execute(f"""
+        INSERT INTO journal_rollups (user_id, crop_name, season, month, entries, total_revenue,
+                                     total_expenses, total_profit, total_yield, total_sold, total_unit_price)
+        SELECT user_id, crop_name, COALESCE(season, ''), {month}, COUNT(id), SUM(total_revenue),
+               SUM(expenses), SUM(profit), SUM(yield_amount), SUM(sold_amount), SUM(unit_price)
+        FROM farm_journal
+        GROUP BY user_id, crop_name, COALESCE(season, ''), {month}
+    """)
+
+
+def downgrade():
+    op.drop_table('journal_rollups')
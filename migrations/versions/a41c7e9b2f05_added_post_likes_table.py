@@ -0,0 +1,38 @@
+"""Added post likes table
+
+Revision ID: a41c7e9b2f05
+Revises: 3b8f1c2d9e47
+Create Date: 2026-10-18 09:31:47.208836
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c7e9b2f05'
+down_revision = '3b8f1c2d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_likes',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('legacy_likes', sa.Integer(), server_default='0', nullable=False))
+
+    # Likes so far were anonymous `likes += 1`s with no post_likes rows; keep them so they can be recounted
+    op.execute("UPDATE posts SET legacy_likes = likes")
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('legacy_likes')
+    op.drop_table('post_likes')
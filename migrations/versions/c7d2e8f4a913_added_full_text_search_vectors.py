@@ -0,0 +1,46 @@
+"""Added full-text search vectors for posts and comments
+
+Revision ID: c7d2e8f4a913
+Revises: a41c7e9b2f05
+Create Date: 2026-10-18 10:12:38.660471
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e8f4a913'
+down_revision = 'a41c7e9b2f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generated tsvector columns are Postgres-only; other databases use the in-process index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(
+        "ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        ") STORED"
+    )
+    op.execute(
+        "ALTER TABLE comments ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "to_tsvector('english', coalesce(content, ''))"
+        ") STORED"
+    )
+    op.create_index('ix_posts_search_vector', 'posts', ['search_vector'], postgresql_using='gin')
+    op.create_index('ix_comments_search_vector', 'comments', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_comments_search_vector', table_name='comments')
+    op.drop_index('ix_posts_search_vector', table_name='posts')
+    op.drop_column('comments', 'search_vector')
+    op.drop_column('posts', 'search_vector')
@@ -0,0 +1,42 @@
+"""Added indexes for hot query paths
+
+Revision ID: e5b91f07c2d8
+Revises: c7d2e8f4a913
+Create Date: 2026-10-18 14:03:51.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b91f07c2d8'
+down_revision = 'c7d2e8f4a913'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, covered columns)
+INDEXES = [
+    ('ix_farm_journal_user_created', 'farm_journal', ['user_id', 'created_at', 'id'], []),
+    ('ix_farm_journal_user_sowing', 'farm_journal', ['user_id', 'sowing_date', 'id'], ['profit']),
+    ('ix_farm_journal_user_crop', 'farm_journal', ['user_id', 'crop_name', 'id'],
+     ['yield_amount', 'total_revenue', 'expenses', 'profit']),
+    ('ix_posts_created', 'posts', ['created_at', 'id'], []),
+    ('ix_comments_post_created', 'comments', ['post_id', 'created_at', 'id'], []),
+    ('ix_post_likes_post', 'post_likes', ['post_id'], []),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY doesn't lock out writes but can't run inside a transaction.
+    # If a build fails it leaves an INVALID index behind: drop it and run the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True,
+                            postgresql_concurrently=True, postgresql_include=include)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,57 @@
+"""Added journal versions and tombstones
+
+Revision ID: f3a6c81d4e20
+Revises: e5b91f07c2d8
+Create Date: 2026-10-18 15:27:09.804412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a6c81d4e20'
+down_revision = 'e5b91f07c2d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('journal_version', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Existing entries keep version 0, so they are only returned by a full (since=0) sync
+    with op.batch_alter_table('farm_journal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.BigInteger(), server_default='0', nullable=False))
+
+    op.create_table('journal_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('entry_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_journal_tombstones_user_version', 'journal_tombstones', ['user_id', 'version'])
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_farm_journal_user_version', 'farm_journal', ['user_id', 'version', 'id'],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_farm_journal_user_version', table_name='farm_journal', if_exists=True,
+                      postgresql_concurrently=True)
+
+    op.drop_index('ix_journal_tombstones_user_version', table_name='journal_tombstones')
+    op.drop_table('journal_tombstones')
+
+    with op.batch_alter_table('farm_journal', schema=None) as batch_op:
+        batch_op.drop_column('version')
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('journal_version')
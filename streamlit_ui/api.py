@@ -1,11 +1,36 @@
 import requests
 import os
+import threading
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 API_URL = os.getenv("FARMBOOK_API_URL", "http://127.0.0.1:5000")
 
+# Last (ETag, body) per token and URL, revalidated with If-None-Match. Shared by every
+# session in this Streamlit process, so bounded in size and age (tokens expire anyway)
+_etag_cache = TTLCache(maxsize=int(os.getenv("ETAG_CACHE_SIZE", 512)), ttl=int(os.getenv("ETAG_CACHE_TTL", 3600)))
+_etag_lock = threading.Lock()  # Sessions run on separate script threads
+
+def _get_json_revalidated(jwt_token, path, params=None):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    key = (jwt_token, path, tuple(sorted((params or {}).items())))
+    with _etag_lock:
+        cached = _etag_cache.get(key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    response = requests.get(f"{API_URL}{path}", headers=headers, params=params)
+    if response.status_code == 304 and cached:
+        return cached[1]  # ✅ Unchanged since last time, reuse the body we already have
+    if response.status_code != 200:
+        return None
+    body = response.json()
+    if response.headers.get("ETag"):
+        with _etag_lock:
+            _etag_cache[key] = (response.headers["ETag"], body)
+    return body
+
 def register_user(username, email, password):
     response = requests.post(f"{API_URL}/register", json={
         "username": username,
@@ -21,31 +46,91 @@ def login_user(email, password):
     })
     return response.json(), response.status_code
 
-def fetch_profit_trend(jwt_token):
-    headers = {"Authorization": f"Bearer {jwt_token}"}
-    response = requests.get(f"{API_URL}/analytics/profit-trend", headers=headers)
-    return response.json() if response.status_code == 200 else None
+# bucket: None (one point per entry), "day", "week", "month", "season" or "year"
+def fetch_profit_trend(jwt_token, bucket=None, max_points=None):
+    params = {k: v for k, v in (("bucket", bucket), ("max_points", max_points)) if v}
+    return _get_json_revalidated(jwt_token, "/analytics/profit-trend", params)
 
 def fetch_crop_comparison(jwt_token):
-    headers = {"Authorization": f"Bearer {jwt_token}"}
-    response = requests.get(f"{API_URL}/analytics/crop-comparison", headers=headers)
-    return response.json() if response.status_code == 200 else None
+    return _get_json_revalidated(jwt_token, "/analytics/crop-comparison")
 
 def fetch_cost_breakdown(jwt_token):
-    headers = {"Authorization": f"Bearer {jwt_token}"}
-    response = requests.get(f"{API_URL}/analytics/cost-breakdown", headers=headers)
-    return response.json() if response.status_code == 200 else None
+    return _get_json_revalidated(jwt_token, "/analytics/cost-breakdown")
+
+# Every dashboard dataset in one response: totals, profit_trend, crop_comparison, season_comparison, yearly
+def fetch_analytics_summary(jwt_token, bucket=None, max_points=None):
+    params = {k: v for k, v in (("bucket", bucket), ("max_points", max_points)) if v}
+    return _get_json_revalidated(jwt_token, "/analytics/summary", params)
 
 def export_pdf_report(jwt_token):
     headers = {"Authorization": f"Bearer {jwt_token}"}
     response = requests.get(f"{API_URL}/export/pdf", headers=headers)
     return response.content if response.status_code == 200 else None
 
-def fetch_journal_entries(jwt_token):
+# Queue a background export ("pdf", "csv" or "parquet"); returns the job, including its id
+def start_export(jwt_token, file_format, **filters):
+    headers = {"Authorization": f"Bearer {jwt_token}", "Content-Type": "application/json"}
+    data = {"format": file_format, "filter": {key: value for key, value in filters.items() if value not in (None, "")}}
+    response = requests.post(f"{API_URL}/exports", json=data, headers=headers)
+    return response.json() if response.status_code == 202 else None
+
+def fetch_export_status(jwt_token, export_id):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = requests.get(f"{API_URL}/exports/{export_id}", headers=headers)
+    return response.json() if response.status_code == 200 else None
+
+def download_export(jwt_token, export_id):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = requests.get(f"{API_URL}/exports/{export_id}/file", headers=headers)
+    return response.content if response.status_code == 200 else None
+
+# Download the journal as "csv" or "parquet", optionally filtered like fetch_journal_entries
+def export_journal_file(jwt_token, file_format, **filters):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    params = {key: value for key, value in filters.items() if value not in (None, "")}
+    response = requests.get(f"{API_URL}/export/{file_format}", headers=headers, params=params)
+    return response.content if response.status_code == 200 else None
+
+# Fetch one page of Journal Entries; filters are crop, season, date_from and date_to
+def fetch_journal_entries(jwt_token, limit=50, cursor=None, sort=None, order=None, fields=None, **filters):
+    params = {"limit": limit, "cursor": cursor, "sort": sort, "order": order,
+              "fields": ",".join(fields) if fields else None, **filters}
+    params = {key: value for key, value in params.items() if value not in (None, "")}
+    return _get_json_revalidated(jwt_token, "/journal", params)
+
+# Fetch (id, crop_name, sowing_date) for every Journal Entry, for pickers
+def fetch_journal_index(jwt_token):
+    return _get_json_revalidated(jwt_token, "/journal/index")
+
+# Fetch a single Journal Entry
+def fetch_journal_entry(jwt_token, entry_id):
+    return _get_json_revalidated(jwt_token, f"/journal/{entry_id}")
+
+# Fetch Journal Entries written or deleted after `since` (0 for everything)
+def fetch_journal_changes(jwt_token, since=0, cursor=None):
     headers = {"Authorization": f"Bearer {jwt_token}"}
-    response = requests.get(f"{API_URL}/journal", headers=headers)
+    params = {"since": since, "cursor": cursor} if cursor else {"since": since}
+    response = requests.get(f"{API_URL}/journal/changes", headers=headers, params=params)
     return response.json() if response.status_code == 200 else None
 
+# Bring a local copy {"version": int, "entries": {id: entry}} up to date; returns False if a request failed
+def sync_journal(jwt_token, local):
+    cursor = None
+    while True:
+        data = fetch_journal_changes(jwt_token, local["version"], cursor)
+        if data is None:
+            return False
+        if data["reset"]:
+            local["entries"] = {}
+        for entry in data["entries"]:
+            local["entries"][entry["id"]] = entry
+        for entry_id in data["deleted"]:
+            local["entries"].pop(entry_id, None)
+        cursor = data["next_cursor"]
+        if not cursor:
+            local["version"] = data["version"]
+            return True
+
 def add_journal_entry(jwt_token, crop_name, season, farm_location, sowing_date, harvest_date, yield_amount, sold_amount, unit_price, expenses, notes):
     headers = {"Authorization": f"Bearer {jwt_token}", "Content-Type": "application/json"}
     data = {
@@ -72,6 +157,14 @@ def add_journal_entry(jwt_token, crop_name, season, farm_location, sowing_date,
 
 
 
+# Bulk import Journal Entries from a CSV or NDJSON file, streamed to the API
+def import_journal_file(jwt_token, file):
+    content_type = "application/x-ndjson" if file.name.lower().endswith((".ndjson", ".jsonl")) else "text/csv"
+    headers = {"Authorization": f"Bearer {jwt_token}", "Content-Type": content_type}
+    response = requests.post(f"{API_URL}/journal/bulk", headers=headers, data=file)
+    return response.json() if response.status_code == 200 else None
+
+
 def update_journal_entry(jwt_token, entry_id, crop_name, season, farm_location, sowing_date, harvest_date, yield_amount, sold_amount, unit_price, expenses, notes):
     headers = {"Authorization": f"Bearer {jwt_token}", "Content-Type": "application/json"}
     data = {
@@ -96,10 +189,51 @@ def delete_journal_entry(jwt_token, entry_id):
     return response.status_code == 200
 
 
-# Fetch Posts
-def fetch_posts(jwt_token):
+# Apply the same changes to many Journal Entries, selected by `ids` or by the list filters
+def batch_update_journal_entries(jwt_token, changes, ids=None, **filters):
+    headers = {"Authorization": f"Bearer {jwt_token}", "Content-Type": "application/json"}
+    data = {"set": changes, "ids": ids} if ids else {"set": changes, "filter": filters}
+    response = requests.patch(f"{API_URL}/journal/batch", json=data, headers=headers)
+    return response.json() if response.status_code == 200 else None
+
+
+def batch_delete_journal_entries(jwt_token, ids=None, **filters):
+    headers = {"Authorization": f"Bearer {jwt_token}", "Content-Type": "application/json"}
+    data = {"ids": ids} if ids else {"filter": filters}
+    response = requests.delete(f"{API_URL}/journal/batch", json=data, headers=headers)
+    return response.json() if response.status_code == 200 else None
+
+
+# Fetch one page of Posts (pass the previous page's `next_cursor` as `before`)
+def fetch_posts(jwt_token, limit=20, before=None):
     headers = {"Authorization": f"Bearer {jwt_token}"}
-    response = requests.get(f"{API_URL}/posts", headers=headers)
+    params = {"limit": limit}
+    if before:
+        params["before"] = before
+    response = requests.get(f"{API_URL}/posts", headers=headers, params=params)
+    return response.json() if response.status_code == 200 else None
+
+# Fetch feed changes (new posts, comments, like counts) after a cursor; without one, returns the current cursor
+def fetch_post_changes(jwt_token, since=None, timeout=0):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    params = {"since": since, "timeout": timeout} if since else {}
+    response = requests.get(f"{API_URL}/posts/changes", headers=headers, params=params, timeout=timeout + 10)
+    return response.json() if response.status_code == 200 else None
+
+# Search Posts and their comments, best match first
+def search_posts(jwt_token, query, limit=20, offset=0):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    params = {"q": query, "limit": limit, "offset": offset}
+    response = requests.get(f"{API_URL}/posts/search", headers=headers, params=params)
+    return response.json() if response.status_code == 200 else None
+
+# Fetch one page of a Post's comments, latest first
+def fetch_comments(jwt_token, post_id, limit=20, before=None):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    params = {"limit": limit}
+    if before:
+        params["before"] = before
+    response = requests.get(f"{API_URL}/posts/{post_id}/comments", headers=headers, params=params)
     return response.json() if response.status_code == 200 else None
 
 # Fetch text file content
@@ -134,6 +268,12 @@ def like_post(jwt_token, post_id):
     response = requests.post(f"{API_URL}/posts/{post_id}/like", headers=headers)
     return response.status_code == 200
 
+# Remove a Like from a Post
+def unlike_post(jwt_token, post_id):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = requests.delete(f"{API_URL}/posts/{post_id}/like", headers=headers)
+    return response.status_code == 200
+
 # Comment on a Post
 def comment_on_post(jwt_token, post_id, content):
     headers = {"Authorization": f"Bearer {jwt_token}"}
@@ -1,7 +1,8 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
-from api import fetch_profit_trend, fetch_crop_comparison, fetch_cost_breakdown, export_pdf_report
+import pandas as pd
+from api import fetch_analytics_summary, export_pdf_report
 
 st.set_page_config(page_title="Farmbook Dashboard", page_icon="📊", layout="wide")
 
@@ -51,17 +52,38 @@ if "jwt_token" not in st.session_state:
 
 # Dashboard Layout
 st.title("Farmbook Dashboard")
+
+TREND_BUCKETS = {"Month": "month", "Week": "week", "Day": "day", "Season": "season", "Year": "year", "Each entry": None}
+TREND_MAX_POINTS = 500  # Roughly one point per two pixels of the chart
+
+trend_bucket = st.selectbox("Profit trend per", list(TREND_BUCKETS))
+
+# ✅ All charts come from one request
+summary = fetch_analytics_summary(st.session_state['jwt_token'], TREND_BUCKETS[trend_bucket], TREND_MAX_POINTS) or {}
+
+totals = summary.get("totals")
+if totals:
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Entries", totals["entries"])
+    col2.metric("Revenue (Rs.)", f"{totals['total_revenue']:,.0f}")
+    col3.metric("Profit (Rs.)", f"{totals['total_profit']:,.0f}")
+    col4.metric("Margin", f"{totals['margin']:.1%}" if totals["margin"] is not None else "-")
+
 st.subheader("Profit Trends Over Time")
 
-# Fetch Profit Trend Data
-data = fetch_profit_trend(st.session_state['jwt_token'])
+# Profit Trend Data
+data = summary.get("profit_trend")
 if data:
-    dates = [entry["sowing_date"] for entry in data]
+    dates = pd.to_datetime([entry["sowing_date"] for entry in data])
     profits = [entry["profit"] for entry in data]
 
     # Plot the Profit Trend
     fig, ax = plt.subplots(figsize=(8, 4))  # Adjusted chart size
-    ax.plot(dates, profits, marker="o", linestyle="-", color="b")
+    ax.plot(dates, profits, marker="o" if len(data) <= 60 else None, linestyle="-", color="b")
+    if trend_bucket == "Season":
+        for date, profit, entry in zip(dates, profits, data):
+            ax.annotate(entry["season"] or "Unspecified", (date, profit), fontsize=7, xytext=(0, 4), textcoords="offset points")
+    fig.autofmt_xdate()
     ax.set_xlabel("Sowing Date")
     ax.set_ylabel("Profit (Rs.)")
     ax.set_title("Profit Trend Over Time", fontsize=12)
@@ -72,7 +94,7 @@ else:
 
 # Crop Comparison
 st.subheader("Crop Comparison - Total Profit")
-data = fetch_crop_comparison(st.session_state['jwt_token'])
+data = summary.get("crop_comparison")
 if data:
     crops = [entry["crop_name"] for entry in data]
     profits = [entry["total_profit"] for entry in data]
@@ -90,8 +112,8 @@ else:
 
 # Cost Breakdown
 st.subheader("Cost Breakdown")
-# Fetch Cost Breakdown Data
-data = fetch_cost_breakdown(st.session_state['jwt_token'])
+# Cost Breakdown Data (per-crop totals include expenses)
+data = summary.get("crop_comparison")
 
 if data:
     crops = [entry["crop_name"] for entry in data]
@@ -111,3 +133,15 @@ if data:
         st.pyplot(fig)
 else:
     st.warning("No cost breakdown data available.")
+
+# Season and Year Comparison
+SUMMARY_COLUMNS = {"entries": "Entries", "avg_yield": "Avg yield (kg)", "avg_unit_price": "Avg price (Rs.)",
+                   "total_revenue": "Revenue (Rs.)", "total_expenses": "Expenses (Rs.)", "total_profit": "Profit (Rs.)", "margin": "Margin"}
+for title, key, field in (("Season Comparison", "season_comparison", "season"), ("Yearly Summary", "yearly", "year")):
+    st.subheader(title)
+    data = summary.get(key)
+    if data:
+        table = pd.DataFrame(data).fillna({field: "Unspecified"}).set_index(field)[list(SUMMARY_COLUMNS)].rename(columns=SUMMARY_COLUMNS)
+        st.dataframe(table.style.format({"Margin": "{:.1%}"}, precision=2, na_rep="-"), use_container_width=True)
+    else:
+        st.warning(f"No {title.lower()} data available.")
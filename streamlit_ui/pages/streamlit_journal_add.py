@@ -1,5 +1,5 @@
 import streamlit as st
-from api import add_journal_entry
+from api import add_journal_entry, import_journal_file
 import datetime
 
 st.set_page_config(page_title="Add New Journal Entry", page_icon="➕", layout="wide")
@@ -92,3 +92,18 @@ if st.button("Add Entry"):
                 st.switch_page("pages/streamlit_journal_view.py")
             else:
                 st.error("Failed to add entry. Please try again.")
+
+# Bulk Import from a spreadsheet export
+st.subheader("Import Entries from a File")
+st.caption("CSV with a header row, or NDJSON (one JSON object per line). Columns: crop_name, season, farm_location, "
+           "sowing_date, harvest_date, yield_amount, sold_amount, unit_price, expenses, notes.")
+import_file = st.file_uploader("Choose a CSV or NDJSON file", type=["csv", "ndjson", "jsonl"])
+if import_file and st.button("Import Entries"):
+    result = import_journal_file(st.session_state['jwt_token'], import_file)
+    if result is None:
+        st.error("Failed to import entries. Please check the file format.")
+    else:
+        st.success(f"Imported {result['inserted']} entries.")
+        if result["failed"]:
+            st.warning(f"{result['failed']} rows were skipped:")
+            st.dataframe(result["errors"], use_container_width=True)
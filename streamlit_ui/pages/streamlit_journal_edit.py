@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from api import fetch_journal_entries, update_journal_entry, delete_journal_entry
+from api import fetch_journal_index, fetch_journal_entry, update_journal_entry, delete_journal_entry
 
 st.set_page_config(page_title="Edit Journal Entry", page_icon="✏️", layout="wide")
 
@@ -56,25 +56,27 @@ if "jwt_token" not in st.session_state:
 
 st.title("Edit Journal Entry")
 
-# Fetch Journal Entries
-data = fetch_journal_entries(st.session_state['jwt_token'])
-if data:
-    journal_data = pd.DataFrame(data)
-else:
-    journal_data = pd.DataFrame(columns=["id", "crop_name", "season", "farm_location", "sowing_date", "harvest_date", "yield_amount", "sold_amount", "unit_price", "expenses", "notes"])
+# Fetch only (id, crop_name, sowing_date) for the picker
+index = fetch_journal_index(st.session_state['jwt_token']) or []
+labels = {row["id"]: f"#{row['id']} - {row['crop_name']} (sown {row['sowing_date']})" for row in index}
 
 # Select Entry to Edit
-if not journal_data.empty:
-    entry_id = st.selectbox("Select an Entry to Edit", ["Select an entry"] + list(journal_data["id"].values))
+if index:
+    entry_id = st.selectbox("Select an Entry to Edit", ["Select an entry"] + list(labels), format_func=lambda i: labels.get(i, i))
+    entry = None
     if entry_id and entry_id != "Select an entry":
-        entry = journal_data[journal_data["id"] == entry_id].iloc[0]
-        
+        # ✅ Load just the selected entry; reruns revalidate it with its ETag instead of downloading it again
+        entry = fetch_journal_entry(st.session_state['jwt_token'], entry_id)
+        if entry is None:
+            st.error("Failed to load entry. Please try again.")
+
+    if entry:
         # Edit Form
         crop_name = st.text_input("Crop Name", entry["crop_name"])
         season = st.text_input("Season", entry["season"])
         farm_location = st.text_input("Farm Location", entry["farm_location"])
         sowing_date = st.date_input("Sowing Date", pd.to_datetime(entry["sowing_date"]))
-        harvest_date = st.date_input("Harvest Date", pd.to_datetime(entry["harvest_date"]) if entry["harvest_date"] else None)
+        harvest_date = st.date_input("Harvest Date", pd.to_datetime(entry["harvest_date"]) if entry["harvest_date"] not in (None, "None") else None)
         yield_amount = st.number_input("Yield (kg)", min_value=0.0, value=float(entry["yield_amount"]))
         sold_amount = st.number_input("Sold Amount (kg)", min_value=0.0, value=float(entry["sold_amount"]))
         unit_price = st.number_input("Unit Price (Rs. per kg)", min_value=0.0, value=float(entry["unit_price"]))
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-from api import fetch_journal_entries, export_pdf_report
+import time
+from api import fetch_journal_entries, start_export, fetch_export_status, download_export, export_journal_file, batch_update_journal_entries, batch_delete_journal_entries
 
 st.set_page_config(page_title="View Journal Entries", page_icon="📖", layout="wide")
 
@@ -53,9 +54,21 @@ if "jwt_token" not in st.session_state:
 
 st.title("Your Journal Entries")
 
-# Export to PDF Button at the Start
+EXPORT_WAIT_SECONDS = 300  # Stop polling a PDF export after this long
+
+# Export to PDF Button at the Start; the report is built in the background while we poll
 if st.button("Export as PDF"):
-    pdf_content = export_pdf_report(st.session_state['jwt_token'])
+    job = start_export(st.session_state['jwt_token'], "pdf")
+    progress_bar = st.progress(0.0, text="Generating PDF report...")
+    deadline = time.monotonic() + EXPORT_WAIT_SECONDS
+    while job and job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(1)
+        job = fetch_export_status(st.session_state['jwt_token'], job["id"])
+        if job:
+            progress_bar.progress(job["progress"], text="Generating PDF report...")
+    progress_bar.empty()
+
+    pdf_content = download_export(st.session_state['jwt_token'], job["id"]) if job and job["status"] == "done" else None
     if pdf_content:
         st.download_button(
             label="Download PDF",
@@ -63,15 +76,108 @@ if st.button("Export as PDF"):
             file_name="farm_journal.pdf",
             mime="application/pdf"
         )
+    elif job and job["status"] in ("queued", "running"):
+        st.warning("The PDF report is taking longer than expected. Please try again later.")
     else:
         st.error("Failed to generate PDF report.")
 
-# Fetch Journal Entries
-data = fetch_journal_entries(st.session_state['jwt_token'])
-if data:
-    journal_data = pd.DataFrame(data)
+# Filters and sorting, applied by the API
+LIST_FIELDS = ["id", "crop_name", "season", "sowing_date", "harvest_date", "yield_amount", "sold_amount", "unit_price", "expenses", "total_revenue", "profit"]
+SORT_OPTIONS = {"Newest entries": ("created_at", "desc"), "Sowing date (latest)": ("sowing_date", "desc"),
+                "Sowing date (earliest)": ("sowing_date", "asc"), "Crop name": ("crop_name", "asc")}
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    crop_filter = st.text_input("Crop")
+with col2:
+    season_filter = st.text_input("Season")
+with col3:
+    date_range = st.date_input("Sowing date range", value=())
+with col4:
+    sort_label = st.selectbox("Sort by", list(SORT_OPTIONS))
+show_details = st.checkbox("Show location and notes")
+
+sort, order = SORT_OPTIONS[sort_label]
+query = {
+    "crop": crop_filter.strip(),
+    "season": season_filter.strip(),
+    "date_from": str(date_range[0]) if len(date_range) > 0 else None,
+    "date_to": str(date_range[1]) if len(date_range) > 1 else None,
+    "sort": sort,
+    "order": order,
+    "fields": None if show_details else LIST_FIELDS,  # ✅ Skip the free-text columns in the list view
+}
+
+# Restart from the first page whenever the query changes
+if st.session_state.get("journal_query") != query:
+    st.session_state["journal_query"] = query
+    st.session_state["journal_cursors"] = [None]
+
+cursors = st.session_state["journal_cursors"]
+data = fetch_journal_entries(st.session_state['jwt_token'], cursor=cursors[-1], **query)
+entries = data["entries"] if data else []
+if entries:
+    journal_data = pd.DataFrame(entries)
 else:
-    journal_data = pd.DataFrame(columns=["id", "crop_name", "season", "farm_location", "sowing_date", "harvest_date", "yield_amount", "sold_amount", "unit_price", "expenses", "total_revenue", "profit", "notes"])
+    journal_data = pd.DataFrame(columns=LIST_FIELDS + (["farm_location", "notes"] if show_details else []))
 
 # Display Entries
 st.dataframe(journal_data.set_index("id"), use_container_width=True)
+
+# Export the filtered journal for analysis elsewhere
+filters = {key: query[key] for key in ("crop", "season", "date_from", "date_to") if query[key]}
+col1, col2 = st.columns(2)
+for column, file_format, mime in ((col1, "csv", "text/csv"), (col2, "parquet", "application/vnd.apache.parquet")):
+    with column:
+        if st.button(f"Export as {file_format.upper()}"):
+            content = export_journal_file(st.session_state['jwt_token'], file_format, **filters)
+            if content:
+                st.download_button(label=f"Download {file_format.upper()}", data=content,
+                                   file_name=f"farm_journal.{file_format}", mime=mime)
+            else:
+                st.error(f"Failed to export {file_format.upper()}.")
+
+# Page Navigation
+col1, col2, col3 = st.columns([1, 1, 4])
+with col1:
+    if len(cursors) > 1 and st.button("⬅️ Previous"):
+        cursors.pop()
+        st.rerun()
+with col2:
+    if data and data["next_cursor"] and st.button("Next ➡️"):
+        cursors.append(data["next_cursor"])
+        st.rerun()
+with col3:
+    st.caption(f"Page {len(cursors)}")
+
+# Bulk Edit / Delete, applied by the API to every entry matching the current filters
+with st.expander("Bulk edit or delete filtered entries"):
+    if not filters:
+        st.info("Set at least one filter above to choose which entries to change.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            new_season = st.text_input("New season")
+        with col2:
+            new_unit_price = st.number_input("New unit price", min_value=0.0, value=None)
+        with col3:
+            new_expenses = st.number_input("New expenses", min_value=0.0, value=None)
+        changes = {"season": new_season.strip() or None, "unit_price": new_unit_price, "expenses": new_expenses}
+        changes = {key: value for key, value in changes.items() if value is not None}
+
+        if st.button("Apply to filtered entries", disabled=not changes):
+            result = batch_update_journal_entries(st.session_state['jwt_token'], changes, **filters)
+            if result:
+                st.success(f"Updated {result['updated']} entries.")
+                st.session_state["journal_cursors"] = [None]
+            else:
+                st.error("Failed to update entries.")
+
+        confirm_delete = st.checkbox("I understand this deletes every entry matching the filters")
+        if st.button("Delete filtered entries", disabled=not confirm_delete):
+            result = batch_delete_journal_entries(st.session_state['jwt_token'], **filters)
+            if result:
+                st.success(f"Deleted {result['deleted']} entries.")
+                st.session_state["journal_cursors"] = [None]
+            else:
+                st.error("Failed to delete entries.")
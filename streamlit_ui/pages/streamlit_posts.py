@@ -1,6 +1,6 @@
 import streamlit as st
 import os
-from api import fetch_posts, fetch_text_file, like_post, comment_on_post, API_URL
+from api import fetch_posts, fetch_post_changes, search_posts, fetch_comments, fetch_text_file, like_post, unlike_post, comment_on_post, API_URL
 
 st.set_page_config(page_title="FarmBook - Social Feed", page_icon="📢", layout="wide")
 
@@ -56,8 +56,82 @@ if "jwt_token" not in st.session_state:
 
 jwt_token = st.session_state["jwt_token"]
 
-# Fetch Posts
-posts = fetch_posts(jwt_token)
+# Fetch Posts page by page, keeping already loaded pages across reruns
+def reset_feed():
+    for key in ("feed_posts", "feed_cursor", "search_query", "feed_changes_cursor"):
+        st.session_state.pop(key, None)
+
+def load_feed_page(before=None):
+    if before is None:
+        # ✅ Take the change cursor first so nothing written while the page loads is missed
+        changes = fetch_post_changes(jwt_token)
+        st.session_state["feed_changes_cursor"] = changes["cursor"] if changes else None
+    page = fetch_posts(jwt_token, before=before)
+    if page is None:
+        return
+    st.session_state["feed_posts"] = st.session_state.get("feed_posts", []) + page["posts"]
+    st.session_state["feed_cursor"] = page["next_cursor"]
+
+def load_search_page(query, offset=0):
+    page = search_posts(jwt_token, query, offset=offset)
+    if page is None:
+        return
+    st.session_state["search_posts"] = (st.session_state["search_posts"] if offset else []) + page["posts"]
+    st.session_state["search_offset"] = page["next_offset"]
+    st.session_state["search_query"] = query
+
+def apply_feed_changes():
+    """Patch the posts already on screen with deltas instead of re-downloading the feed."""
+    changes = fetch_post_changes(jwt_token, st.session_state.get("feed_changes_cursor"))
+    if changes is None:
+        return
+    if changes["reset"]:
+        reset_feed()  # Server restarted or we fell too far behind
+        return
+    st.session_state["feed_changes_cursor"] = changes["cursor"]
+
+    loaded = {}
+    for post in st.session_state.get("feed_posts", []) + st.session_state.get("search_posts", []):
+        loaded.setdefault(post["id"], []).append(post)
+
+    for like in changes["likes"]:
+        for post in loaded.get(like["post_id"], []):
+            post["likes"] = like["likes"]
+
+    for delta in changes["comments"]:
+        for post in loaded.get(delta["post_id"], []):
+            seen = {c["id"] for c in post["latest_comments"]}
+            new_comments = [c for c in delta["new_comments"] if c["id"] not in seen]
+            post["comment_count"] = delta["comment_count"]
+            post["latest_comments"] = (new_comments + post["latest_comments"])[:3]  # Same preview size as the feed
+        all_comments = st.session_state.get(f"all_comments_{delta['post_id']}")
+        if all_comments:
+            seen = {c["id"] for c in all_comments["comments"]}
+            all_comments["comments"] = [c for c in delta["new_comments"] if c["id"] not in seen] + all_comments["comments"]
+
+    new_ids = set(changes["new_post_ids"]) - set(loaded)
+    if new_ids and "feed_posts" in st.session_state:
+        head = fetch_posts(jwt_token)
+        if head:
+            fresh = [post for post in head["posts"] if post["id"] in new_ids]
+            st.session_state["feed_posts"] = fresh + st.session_state["feed_posts"]
+
+if st.button("🔄 Refresh feed"):
+    reset_feed()
+
+if "feed_changes_cursor" in st.session_state:
+    apply_feed_changes()
+
+search_query = st.text_input("🔍 Search posts and comments", placeholder="e.g. aphids on tomato").strip()
+
+if search_query:
+    if st.session_state.get("search_query") != search_query:
+        load_search_page(search_query)
+    posts = st.session_state.get("search_posts", [])
+else:
+    if "feed_posts" not in st.session_state:
+        load_feed_page()
+    posts = st.session_state.get("feed_posts", [])
 
 if posts:
     for post in posts:
@@ -72,7 +146,17 @@ if posts:
                 file_extension = os.path.splitext(file_url)[1].lower()
 
                 if file_extension in [".jpg", ".png", ".jpeg"]:
-                    st.image(file_url, use_container_width=True)
+                    # ✅ Show a feed-sized rendition; the original is only loaded on request
+                    variants = post.get("variants", {})
+                    original_key = f"show_original_{post['id']}"
+                    preview = variants.get("feed") or variants.get("thumb")
+                    if preview and not st.session_state.get(original_key):
+                        st.image(f"{API_URL}{preview}", use_container_width=True)
+                        if st.button("🔍 View original", key=f"original_{post['id']}"):
+                            st.session_state[original_key] = True
+                            st.rerun()
+                    else:
+                        st.image(file_url, use_container_width=True)
                 elif file_extension in [".mp4", ".mov"]:
                     st.video(file_url)
                 elif file_extension == ".txt":
@@ -84,9 +168,15 @@ if posts:
                 else:
                     st.warning("⚠️ Unsupported file format.")
 
-            # Like Button
-            if st.button(f"👍 {post['likes']}", key=f"like_{post['id']}"):
+            # Like Button (toggles between like and unlike)
+            if post["liked_by_me"]:
+                if st.button(f"💚 {post['likes']}", key=f"like_{post['id']}", help="Unlike"):
+                    if unlike_post(jwt_token, post['id']):
+                        post["liked_by_me"] = False  # The new count arrives with the next feed delta
+                        st.rerun()
+            elif st.button(f"👍 {post['likes']}", key=f"like_{post['id']}"):
                 if like_post(jwt_token, post['id']):
+                    post["liked_by_me"] = True
                     st.rerun()
 
             # Unique key for each post's comment input
@@ -106,17 +196,37 @@ if posts:
                         del st.session_state[comment_key]  # ✅ Remove input key to reset field
                         st.rerun()  # ✅ Refresh UI to show new comment and clear field
 
-            # Display Comments
-            if post["comments"]:
-                # ✅ Sort comments again (just in case)
-                sorted_comments = sorted(post["comments"], key=lambda x: x['created_at'], reverse=True)
-
-                # ✅ Display Comments (latest first)
-                if sorted_comments:
-                    st.write("💬 **Latest Comments:**")
-                    for comment in sorted_comments:
-                        st.write(f"👉 **{comment['username']}**: {comment['content']} ({comment['created_at']})")
+            # Display Comments (the feed only carries the latest few)
+            loaded = st.session_state.get(f"all_comments_{post['id']}")
+            comments = loaded["comments"] if loaded else post["latest_comments"]
+            if comments:
+                st.write(f"💬 **Latest Comments ({post['comment_count']}):**")
+                for comment in comments:
+                    st.write(f"👉 **{comment['username']}**: {comment['content']} ({comment['created_at']})")
+
+            # Page through the rest of the comments on demand
+            has_more = loaded["next_cursor"] if loaded else post["comment_count"] > len(comments)
+            if has_more and st.button("💬 Show more comments", key=f"more_comments_{post['id']}"):
+                page = fetch_comments(jwt_token, post['id'], before=loaded["next_cursor"] if loaded else None)
+                if page:
+                    st.session_state[f"all_comments_{post['id']}"] = {
+                        "comments": (loaded["comments"] if loaded else []) + page["comments"],
+                        "next_cursor": page["next_cursor"],
+                    }
+                    st.rerun()
 
             st.markdown("---")
+
+    # Load the next page on demand instead of the whole feed
+    if search_query:
+        if st.session_state.get("search_offset") and st.button("⬇️ More results"):
+            load_search_page(search_query, offset=st.session_state["search_offset"])
+            st.rerun()
+    elif st.session_state.get("feed_cursor"):
+        if st.button("⬇️ Load more posts"):
+            load_feed_page(before=st.session_state["feed_cursor"])
+            st.rerun()
+elif search_query:
+    st.info("ℹ️ No posts match your search.")
 else:
     st.info("ℹ️ No posts available yet.")